@@ -0,0 +1,46 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from config import MAX_CHECKPOINT_THREADS
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver that keeps checkpoints for the most recent threads only.
+
+    Every chat turn writes a checkpoint per graph step, each holding the full
+    state (documents, labs, findings, ...). Threads are tracked in LRU order
+    and the least recently written one is dropped once the limit is exceeded.
+    """
+
+    def __init__(self, max_threads: int = MAX_CHECKPOINT_THREADS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self._thread_order = OrderedDict()
+        self._thread_lock = threading.Lock()
+
+    def _touch(self, thread_id: str) -> None:
+        with self._thread_lock:
+            self._thread_order[thread_id] = None
+            self._thread_order.move_to_end(thread_id)
+            evicted = []
+            while len(self._thread_order) > self.max_threads:
+                evicted.append(self._thread_order.popitem(last=False)[0])
+
+        for old_thread in evicted:
+            logger.debug(f"Evicting checkpoints for thread {old_thread}")
+            super().delete_thread(old_thread)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._thread_lock:
+            self._thread_order.pop(thread_id, None)
+        super().delete_thread(thread_id)
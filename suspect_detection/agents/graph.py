@@ -1,13 +1,17 @@
+import asyncio
 import logging
-from typing import Literal
+import threading
+from typing import Literal, Union
 
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Send
 
+from agents.checkpointer import BoundedMemorySaver
 from agents.state import AgentState, create_initial_state
 
 # Import all node functions
 from agents.nodes.orchestrator import orchestrator_node, list_patients_node
+from agents.nodes.batch_analysis import batch_analyze_node
 from agents.nodes.documents import load_documents_node
 from agents.nodes.extraction import extraction_node
 from agents.nodes.detection import (
@@ -17,7 +21,7 @@ from agents.nodes.detection import (
     contradiction_node,
     aggregate_findings_node,
 )
-from agents.nodes.supervisor import supervisor_node
+from agents.nodes.supervisor import DETECTION_STRATEGIES, get_relevant_strategies, supervisor_node
 from agents.nodes.validation import self_reflect_node, refine_node
 from agents.nodes.report import report_node
 from agents.nodes.answer_query import answer_query_node
@@ -28,7 +32,7 @@ logger = logging.getLogger(__name__)
 
 
 def route_from_orchestrator(state: AgentState) -> Literal[
-    "list_patients", "analyze", "retrieve_info", "answer_query", "medical_qa", "general_response"
+    "list_patients", "analyze", "batch_analyze", "retrieve_info", "answer_query", "medical_qa", "general_response"
 ]:
     return state.get("next_step", "general_response")
 
@@ -44,6 +48,20 @@ def route_from_extraction(state: AgentState) -> Literal["supervisor", "answer_qu
     return "supervisor"
 
 
+def route_from_extraction_parallel(state: AgentState) -> Union[list[Send], Literal["answer_query", "aggregate"]]:
+    # Info requests skip detection entirely
+    if state.get("info_request"):
+        return "answer_query"
+
+    # Fan out to every relevant strategy at once; they join at aggregate
+    strategies = get_relevant_strategies(state)
+    if not strategies:
+        return "aggregate"
+
+    logger.info(f"Dispatching detection strategies in parallel: {strategies}")
+    return [Send(strategy, state) for strategy in strategies]
+
+
 def route_from_supervisor(state: AgentState) -> Literal[
     "cross_reference", "dropoff", "symptom_cluster", "contradiction", "aggregate"
 ]:
@@ -60,9 +78,14 @@ def route_from_validation(state: AgentState) -> Literal["refine", "report"]:
     return "report"
 
 
-def build_graph() -> StateGraph:
+def build_graph(parallel: bool = True) -> StateGraph:
     """Build the complete LangGraph workflow.
 
+    Args:
+        parallel: Dispatch all relevant detection strategies at once from
+            extraction via the Send API. When False, the supervisor runs
+            them one at a time in a loop.
+
     Returns:
         Uncompiled StateGraph
     """
@@ -72,6 +95,9 @@ def build_graph() -> StateGraph:
     workflow.add_node("orchestrator", orchestrator_node)
     workflow.add_node("list_patients", list_patients_node)
 
+    # Multi-patient analysis (runs the analysis path per patient)
+    workflow.add_node("batch_analyze", batch_analyze_node)
+
     # Document retrieval (uses hybrid search)
     workflow.add_node("load_documents", load_documents_node)
 
@@ -87,8 +113,9 @@ def build_graph() -> StateGraph:
     # General response (for greetings, help, fallback, errors)
     workflow.add_node("general_response", general_question_node)
 
-    # Detection (Supervisor pattern)
-    workflow.add_node("supervisor", supervisor_node)
+    # Detection
+    if not parallel:
+        workflow.add_node("supervisor", supervisor_node)
     workflow.add_node("cross_reference", cross_reference_node)
     workflow.add_node("dropoff", dropoff_node)
     workflow.add_node("symptom_cluster", symptom_cluster_node)
@@ -112,6 +139,7 @@ def build_graph() -> StateGraph:
         {
             "list_patients": "list_patients",
             "analyze": "load_documents",
+            "batch_analyze": "batch_analyze",
             "retrieve_info": "load_documents",  # Same path, but info_request flag is set
             "answer_query": "answer_query",     # For followups with cached patient data
             "medical_qa": "medical_qa",         # For general medical questions
@@ -121,6 +149,7 @@ def build_graph() -> StateGraph:
 
     # Terminal nodes for simple paths
     workflow.add_edge("list_patients", END)
+    workflow.add_edge("batch_analyze", END)
 
     # Document retrieval with error handling
     workflow.add_conditional_edges(
@@ -132,39 +161,49 @@ def build_graph() -> StateGraph:
         },
     )
 
-    # Extraction -> either Supervisor (for analysis) or answer_query (for info requests)
-    workflow.add_conditional_edges(
-        "extraction",
-        route_from_extraction,
-        {
-            "supervisor": "supervisor",
-            "answer_query": "answer_query",
-        },
-    )
-
     # Terminal nodes for response paths
     workflow.add_edge("answer_query", END)
     workflow.add_edge("medical_qa", END)
     workflow.add_edge("general_response", END)
 
-    # Supervisor routing to detection agents
-    workflow.add_conditional_edges(
-        "supervisor",
-        route_from_supervisor,
-        {
-            "cross_reference": "cross_reference",
-            "dropoff": "dropoff",
-            "symptom_cluster": "symptom_cluster",
-            "contradiction": "contradiction",
-            "aggregate": "aggregate",
-        },
-    )
-
-    # Detection agents return to supervisor
-    workflow.add_edge("cross_reference", "supervisor")
-    workflow.add_edge("dropoff", "supervisor")
-    workflow.add_edge("symptom_cluster", "supervisor")
-    workflow.add_edge("contradiction", "supervisor")
+    if parallel:
+        # Extraction -> answer_query, or fan-out to all relevant detection agents
+        workflow.add_conditional_edges(
+            "extraction",
+            route_from_extraction_parallel,
+            ["answer_query", "aggregate", *DETECTION_STRATEGIES],
+        )
+
+        # Detection agents join at aggregate
+        for strategy in DETECTION_STRATEGIES:
+            workflow.add_edge(strategy, "aggregate")
+    else:
+        # Extraction -> either Supervisor (for analysis) or answer_query (for info requests)
+        workflow.add_conditional_edges(
+            "extraction",
+            route_from_extraction,
+            {
+                "supervisor": "supervisor",
+                "answer_query": "answer_query",
+            },
+        )
+
+        # Supervisor routing to detection agents
+        workflow.add_conditional_edges(
+            "supervisor",
+            route_from_supervisor,
+            {
+                "cross_reference": "cross_reference",
+                "dropoff": "dropoff",
+                "symptom_cluster": "symptom_cluster",
+                "contradiction": "contradiction",
+                "aggregate": "aggregate",
+            },
+        )
+
+        # Detection agents return to supervisor
+        for strategy in DETECTION_STRATEGIES:
+            workflow.add_edge(strategy, "supervisor")
 
     # Aggregate -> Self-reflect
     workflow.add_edge("aggregate", "self_reflect")
@@ -183,45 +222,86 @@ def build_graph() -> StateGraph:
     # Report -> End
     workflow.add_edge("report", END)
 
-    logger.info("Graph built with all nodes and edges")
+    logger.info(f"Graph built with all nodes and edges (parallel={parallel})")
     return workflow
 
 
-def create_graph(checkpointer=None):
+def create_graph(checkpointer=None, parallel: bool = True):
     """Create compiled graph with checkpointing.
 
     Args:
-        checkpointer: Pre-configured checkpointer (defaults to MemorySaver)
+        checkpointer: Pre-configured checkpointer (defaults to BoundedMemorySaver)
+        parallel: Use parallel detection fan-out (see build_graph)
 
     Returns:
         Compiled graph ready for invocation
     """
-    workflow = build_graph()
+    workflow = build_graph(parallel=parallel)
 
     if checkpointer is None:
-        checkpointer = MemorySaver()
+        checkpointer = BoundedMemorySaver()
 
     return workflow.compile(checkpointer=checkpointer)
 
 
+# Compiled graph shared by callers that don't pass their own
+_default_graph = None
+_default_graph_lock = threading.Lock()
+
+
+def get_default_graph():
+    """Return the compiled graph shared by all sessions.
+
+    Sessions are kept apart by thread_id, so one compiled graph (and its
+    checkpointer) serves every Orchestrator.
+    """
+    global _default_graph
+    if _default_graph is None:
+        with _default_graph_lock:
+            if _default_graph is None:
+                _default_graph = create_graph()
+    return _default_graph
+
+
+# Event loop behind run_analysis_sync. Pooled async HTTP connections (the
+# shared Gemini client's) belong to the loop that opened them, so every sync
+# call has to run on the same long-lived loop rather than a fresh asyncio.run
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop
+    if _sync_loop is None:
+        with _sync_loop_lock:
+            if _sync_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="run-analysis-sync", daemon=True
+                ).start()
+                _sync_loop = loop
+    return _sync_loop
+
+
 # Keys to preserve from previous state for context continuity
-_CONTEXT_KEYS = [
+_CONTEXT_KEYS = frozenset({
     "patient_id", "documents", "medications", "labs", "conditions",
     "prior_year_conditions", "symptoms", "validated_findings", "findings"
-]
+})
 
 
 def _preserve_context(initial_state: dict, previous_state: dict) -> None:
     """Preserve relevant context from previous state for follow-up questions.
 
-    Modifies initial_state in place.
+    Modifies initial_state in place. Values are carried over by reference,
+    not copied.
     """
     if not previous_state:
         return
 
-    for key in _CONTEXT_KEYS:
-        if previous_state.get(key):
-            initial_state[key] = previous_state[key]
+    initial_state.update({
+        key: value for key in _CONTEXT_KEYS if (value := previous_state.get(key))
+    })
 
 
 async def run_analysis(
@@ -235,14 +315,14 @@ async def run_analysis(
     Args:
         user_message: User's message/query
         thread_id: Optional thread ID for checkpointing
-        graph: Optional pre-compiled graph
+        graph: Optional pre-compiled graph (defaults to a shared module graph)
         previous_state: Optional previous state to preserve context
 
     Returns:
         Final state dict with response
     """
     if graph is None:
-        graph = create_graph()
+        graph = get_default_graph()
 
     # Start with fresh state, preserving context from previous if available
     initial_state = create_initial_state(user_message)
@@ -261,6 +341,10 @@ def run_analysis_sync(
 ) -> dict:
     """Synchronous version of run_analysis.
 
+    Several nodes are async, so this submits the async graph to one
+    long-lived background event loop and blocks until it finishes. The
+    loop is shared across calls so pooled client connections stay usable.
+
     Args:
         user_message: User's message/query
         thread_id: Optional thread ID for checkpointing
@@ -270,16 +354,13 @@ def run_analysis_sync(
     Returns:
         Final state dict with response
     """
-    if graph is None:
-        graph = create_graph()
-
-    # Start with fresh state, preserving context from previous if available
-    initial_state = create_initial_state(user_message)
-    _preserve_context(initial_state, previous_state)
-
-    config = {"configurable": {"thread_id": thread_id}} if thread_id else {}
-
-    return graph.invoke(initial_state, config=config)
+    future = asyncio.run_coroutine_threadsafe(run_analysis(
+        user_message=user_message,
+        thread_id=thread_id,
+        graph=graph,
+        previous_state=previous_state,
+    ), _get_sync_loop())
+    return future.result()
 
 
 if __name__ == "__main__":
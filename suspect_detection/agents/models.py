@@ -102,10 +102,30 @@ FINDING_VALIDATION_SCHEMA = {
         "confidence": {"type": "NUMBER"},
         "issues": {"type": "ARRAY", "items": {"type": "STRING"}},
         "suggested_fix": {"type": "STRING"},
+        "corrected_signal": {"type": "STRING"},
     },
     "required": ["is_supported", "has_hallucination", "confidence"],
 }
 
+# Schema for validating several findings in one call (index = position in the prompt).
+# Confidence is generated before the free-text fields so the model has settled
+# it before deciding whether they are needed.
+BATCH_FINDING_VALIDATION_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            **FINDING_VALIDATION_SCHEMA["properties"],
+        },
+        "required": ["index", *FINDING_VALIDATION_SCHEMA["required"]],
+        "propertyOrdering": [
+            "index", "confidence", "is_supported", "has_hallucination",
+            "issues", "suggested_fix", "corrected_signal",
+        ],
+    },
+}
+
 # Schema for supervisor routing decision
 SUPERVISOR_DECISION_SCHEMA = {
     "type": "OBJECT",
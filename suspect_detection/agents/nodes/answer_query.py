@@ -1,9 +1,11 @@
 import logging
 
+from langgraph.config import get_stream_writer
+
 from agents.state import AgentState
 from agents.gemini_client import get_gemini_client
 from agents.utils import build_patient_context
-from config import GEMINI_FLASH_MODEL
+from config import GEMINI_FLASH_MODEL, PATIENT_CONTEXT_CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +32,22 @@ Do NOT:
 Just present the requested data clearly and concisely.
 """
 
+# State keys that build_patient_context renders
+_CONTEXT_DATA_KEYS = (
+    "medications", "labs", "conditions", "prior_year_conditions",
+    "symptoms", "validated_findings", "findings",
+)
+
+
+def _get_writer():
+    # get_stream_writer only works inside a graph run
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _: None
+
 
-def answer_query_node(state: AgentState) -> dict:
+async def answer_query_node(state: AgentState) -> dict:
     patient_id = state.get("patient_id")
     original_query = state.get("original_query", "")
 
@@ -49,15 +65,34 @@ def answer_query_node(state: AgentState) -> dict:
 
     logger.info(f"Answering info query for patient {patient_id}: {original_query[:50]}...")
 
+    # Nothing extracted (no documents, or extraction failed) - skip the LLM call
+    if not any(state.get(key) for key in _CONTEXT_DATA_KEYS):
+        logger.info(f"No extracted data for patient {patient_id}, skipping LLM call")
+        return {
+            "response": f"No patient data is available to answer that question for patient {patient_id}.",
+            "patient_id": patient_id,
+            "next_step": "end",
+        }
+
     context = build_patient_context(state)
 
     try:
         client = get_gemini_client()
-        response = client.generate(
-            prompt=f"Patient data:\n{context}\n\nUser question: {original_query}",
+        writer = _get_writer()
+        parts = []
+        # Patient data repeats across follow-ups, so it's cached with the prompt when large enough
+        async for delta in client.generate_stream(
+            prompt=f"User question: {original_query}",
             model=GEMINI_FLASH_MODEL,
             system_instruction=ANSWER_QUERY_PROMPT,
-        )
+            use_context_cache=True,
+            cached_prefix=f"Patient data:\n{context}\n\n",
+            cached_prefix_ttl=PATIENT_CONTEXT_CACHE_TTL,
+        ):
+            parts.append(delta)
+            # Surfaced to callers streaming with stream_mode="custom"
+            writer({"response_delta": delta})
+        response = "".join(parts)
 
         logger.info(f"Generated info response for patient {patient_id}")
 
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import threading
+
+from agents.state import AgentState, create_initial_state
+
+logger = logging.getLogger(__name__)
+
+# Un-checkpointed copy of the workflow used to analyze each patient
+_analysis_graph = None
+_analysis_graph_lock = threading.Lock()
+
+
+def _get_analysis_graph():
+    global _analysis_graph
+    with _analysis_graph_lock:
+        if _analysis_graph is None:
+            # Imported here: agents.graph imports this module
+            from agents.graph import build_graph
+            # checkpointer=False keeps the per-patient runs out of the session's thread
+            _analysis_graph = build_graph().compile(checkpointer=False)
+        return _analysis_graph
+
+
+async def _analyze_one(graph, patient_id: str) -> str:
+    try:
+        result = await graph.ainvoke(create_initial_state(f"Analyze patient {patient_id}"))
+        return result.get("response") or f"**Patient Analysis: {patient_id}**\n\nNo response generated."
+    except Exception as e:
+        logger.error(f"Batch analysis failed for {patient_id}: {e}")
+        return f"**Patient Analysis: {patient_id}**\n\nAnalysis encountered an error: {e}"
+
+
+async def batch_analyze_node(state: AgentState) -> dict:
+    """Analyze several patients concurrently and combine their reports.
+
+    Each patient runs through the regular analysis path independently, so
+    total latency is bounded by the slowest patient rather than the sum.
+    """
+    patient_ids = state.get("patient_ids", [])
+    logger.info(f"Batch analyzing {len(patient_ids)} patients: {patient_ids}")
+
+    graph = _get_analysis_graph()
+    reports = await asyncio.gather(*(_analyze_one(graph, pid) for pid in patient_ids))
+
+    return {
+        "response": "\n\n---\n\n".join(reports),
+        "next_step": "end",
+    }
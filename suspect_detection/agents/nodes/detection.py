@@ -1,4 +1,7 @@
+import functools
 import logging
+import operator
+import re
 
 from agents.state import AgentState
 from config import (
@@ -64,8 +67,14 @@ LAB_THRESHOLDS = {
     "ldl": {"threshold": LAB_LDL, "op": ">", "condition": "hyperlipidemia"},
 }
 
+# Bind each rule's op string to its comparator once
+_LAB_OPS = {">=": operator.ge, "<": operator.lt, ">": operator.gt}
+LAB_THRESHOLDS = {
+    name: {**rule, "cmp": _LAB_OPS[rule["op"]]} for name, rule in LAB_THRESHOLDS.items()
+}
+
 # Chronic conditions
-CHRONIC_CONDITIONS = [
+CHRONIC_CONDITIONS = (
     "diabetes", "dm", "type 2 diabetes", "type 1 diabetes",
     "hypertension", "htn", "high blood pressure",
     "ckd", "chronic kidney disease", "kidney disease",
@@ -81,34 +90,37 @@ CHRONIC_CONDITIONS = [
     "obesity", "bmi",
     "osteoporosis",
     "dementia", "alzheimer",
-]
+)
+
+# Single regex scan instead of one substring test per chronic keyword
+_CHRONIC_RE = re.compile("|".join(map(re.escape, CHRONIC_CONDITIONS)))
 
 # Symptom clusters
 SYMPTOM_CLUSTERS = {
     "sleep_apnea": {
-        "symptoms": ["snoring", "apnea", "gasping", "daytime sleepiness", "fatigue",
-                    "morning headache", "drowsy", "tired", "excessive sleepiness"],
+        "symptoms": ("snoring", "apnea", "gasping", "daytime sleepiness", "fatigue",
+                    "morning headache", "drowsy", "tired", "excessive sleepiness"),
         "min_matches": SLEEP_APNEA_MIN_MATCHES,
         "condition": "obstructive sleep apnea",
         "severity": "medium",
     },
     "heart_failure": {
-        "symptoms": ["dyspnea", "shortness of breath", "edema", "swelling",
-                    "fatigue", "orthopnea", "pnd", "paroxysmal nocturnal", "leg swelling"],
+        "symptoms": ("dyspnea", "shortness of breath", "edema", "swelling",
+                    "fatigue", "orthopnea", "pnd", "paroxysmal nocturnal", "leg swelling"),
         "min_matches": HEART_FAILURE_MIN_MATCHES,
         "condition": "heart failure",
         "severity": "high",
     },
     "depression": {
-        "symptoms": ["sad", "depressed", "hopeless", "anhedonia", "sleep problems",
-                    "insomnia", "fatigue", "appetite", "weight change", "concentration"],
+        "symptoms": ("sad", "depressed", "hopeless", "anhedonia", "sleep problems",
+                    "insomnia", "fatigue", "appetite", "weight change", "concentration"),
         "min_matches": DEPRESSION_MIN_MATCHES,
         "condition": "depression",
         "severity": "medium",
     },
     "hypothyroidism": {
-        "symptoms": ["fatigue", "weight gain", "cold intolerance", "constipation",
-                    "dry skin", "hair loss", "bradycardia"],
+        "symptoms": ("fatigue", "weight gain", "cold intolerance", "constipation",
+                    "dry skin", "hair loss", "bradycardia"),
         "min_matches": HYPOTHYROIDISM_MIN_MATCHES,
         "condition": "hypothyroidism",
         "severity": "medium",
@@ -116,78 +128,159 @@ SYMPTOM_CLUSTERS = {
 }
 
 
-def _condition_matches(condition_name: str, target_conditions: list[str]) -> bool:
-    condition_lower = condition_name.lower()
+class _KeywordMatcher:
+    """Finds every keyword that occurs as a substring of a text in one regex pass.
+
+    Keywords are tried longest-first inside a lookahead, so each position
+    reports the longest keyword starting there; shorter keywords that are
+    prefixes of it are added from a precomputed table.
+    """
+
+    def __init__(self, keywords):
+        ordered = sorted(set(keywords), key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))")
+        self._prefixes = {
+            kw: frozenset(other for other in ordered if kw.startswith(other))
+            for kw in ordered
+        }
+
+    def find_all(self, text: str) -> set[str]:
+        found = set()
+        for match in self._pattern.finditer(text):
+            found |= self._prefixes[match.group(1)]
+        return found
+
+
+_SYMPTOM_MATCHER = _KeywordMatcher(
+    symptom for cluster in SYMPTOM_CLUSTERS.values() for symptom in cluster["symptoms"]
+)
+
+
+def _build_condition_token_index() -> dict[str, frozenset]:
+    index = {}
+    for med, tokens in MED_CONDITION_MAP.items():
+        for token in tokens:
+            index.setdefault(token, set()).add(med)
+    return {token: frozenset(meds) for token, meds in index.items()}
+
+
+# Reverse index: expected-condition token -> meds that treat it
+_CONDITION_TOKEN_TO_MEDS = _build_condition_token_index()
+
+_CONDITION_TOKEN_MATCHER = _KeywordMatcher(_CONDITION_TOKEN_TO_MEDS)
+
+
+@functools.lru_cache(maxsize=1024)
+def _meds_treating(condition_lower: str) -> frozenset:
+    # Same test as _condition_matches, run once against every token at once
+    tokens = _CONDITION_TOKEN_MATCHER.find_all(condition_lower)
+    tokens.update(token for token in _CONDITION_TOKEN_TO_MEDS if condition_lower in token)
+    return frozenset(med for token in tokens for med in _CONDITION_TOKEN_TO_MEDS[token])
+
+
+_LAB_MATCHER = _KeywordMatcher(LAB_THRESHOLDS)
+
+# Flattened (name, cmp, threshold, op, condition) rows, in LAB_THRESHOLDS order
+_LAB_RULES = tuple(
+    (name, rule["cmp"], rule["threshold"], rule["op"], rule["condition"])
+    for name, rule in LAB_THRESHOLDS.items()
+)
+
+
+# Hashable copies of MED_CONDITION_MAP values for the cached matcher
+_MED_CONDITION_TARGETS = {med: tuple(targets) for med, targets in MED_CONDITION_MAP.items()}
+
+
+# Same (name, targets) pairs recur across meds, clusters and patients; targets
+# must be tuples so they can key the cache
+@functools.lru_cache(maxsize=4096)
+def _condition_matches(condition_lower: str, target_conditions: tuple[str, ...]) -> bool:
     for target in target_conditions:
         if target in condition_lower or condition_lower in target:
             return True
     return False
 
 
-def _has_condition(conditions: list[dict], target_conditions: list[str]) -> bool:
+# Entities are normalized in extraction, so name_lower is always present
+def _has_condition(conditions: list[dict], target_conditions: tuple[str, ...]) -> bool:
     for cond in conditions:
-        name = cond.get("name_lower", cond.get("name", "").lower())
-        if _condition_matches(name, target_conditions):
+        if _condition_matches(cond["name_lower"], target_conditions):
             return True
     return False
 
 
-def cross_reference_node(state: AgentState) -> dict:
+def _condition_checker(conditions: list[dict]):
+    """Build a per-patient version of _has_condition over precomputed names.
+
+    "target in some condition name" becomes one substring search over the
+    NUL-joined names; results are memoized per target tuple for the call.
+    """
+    cond_lowers = {cond["name_lower"] for cond in conditions}
+    if not cond_lowers:
+        return lambda target_conditions: False
+
+    joined = "\0".join(cond_lowers)
+
+    @functools.lru_cache(maxsize=None)
+    def has_condition(target_conditions: tuple[str, ...]) -> bool:
+        return any(
+            target in joined or any(name in target for name in cond_lowers)
+            for target in target_conditions
+        )
+
+    return has_condition
+
+
+# Detection nodes are CPU-only but declared async so LangGraph runs them
+# directly on the event loop instead of handing each one to a worker thread.
+async def cross_reference_node(state: AgentState) -> dict:
     medications = state.get("medications", [])
     labs = state.get("labs", [])
     conditions = state.get("conditions", [])
 
     findings = []
+    has_condition = _condition_checker(conditions)
 
     # Medication gaps
     for med in medications:
-        med_name = med.get("name_lower", med.get("name", "").lower())
-        expected = MED_CONDITION_MAP.get(med_name, [])
+        expected = _MED_CONDITION_TARGETS.get(med["name_lower"])
 
-        if expected and not _has_condition(conditions, expected):
+        if expected and not has_condition(expected):
             findings.append({
                 "type": "medication_diagnosis_gap",
                 "severity": "high",
                 "medication": med.get("name"),
-                "expected_conditions": expected,
+                "expected_conditions": list(expected),
                 "signal": f"Patient takes {med.get('name')} but no {'/'.join(expected[:2])} documented",
                 "strategy": "cross_reference",
             })
 
     # Lab gaps
     for lab in labs:
-        lab_name = lab.get("name_lower", lab.get("name", "").lower())
         value = lab.get("value")
+        if value is None:
+            continue
 
-        for threshold_name, rule in LAB_THRESHOLDS.items():
-            if threshold_name not in lab_name:
-                continue
+        matched = _LAB_MATCHER.find_all(lab["name_lower"])
+        if not matched:
+            continue
 
-            if value is None:
+        for threshold_name, cmp, threshold, op, expected_condition in _LAB_RULES:
+            if threshold_name not in matched or not cmp(value, threshold):
                 continue
 
-            threshold_met = False
-            if rule["op"] == ">=" and value >= rule["threshold"]:
-                threshold_met = True
-            elif rule["op"] == "<" and value < rule["threshold"]:
-                threshold_met = True
-            elif rule["op"] == ">" and value > rule["threshold"]:
-                threshold_met = True
-
-            if threshold_met:
-                expected_condition = rule["condition"]
-                if not _has_condition(conditions, [expected_condition]):
-                    findings.append({
-                        "type": "lab_diagnosis_gap",
-                        "severity": "high",
-                        "lab": lab.get("name"),
-                        "value": value,
-                        "unit": lab.get("unit", ""),
-                        "threshold": f"{rule['op']} {rule['threshold']}",
-                        "expected_condition": expected_condition,
-                        "signal": f"{lab.get('name')} = {value} suggests {expected_condition} but not documented",
-                        "strategy": "cross_reference",
-                    })
+            if not has_condition((expected_condition,)):
+                findings.append({
+                    "type": "lab_diagnosis_gap",
+                    "severity": "high",
+                    "lab": lab.get("name"),
+                    "value": value,
+                    "unit": lab.get("unit", ""),
+                    "threshold": f"{op} {threshold}",
+                    "expected_condition": expected_condition,
+                    "signal": f"{lab.get('name')} = {value} suggests {expected_condition} but not documented",
+                    "strategy": "cross_reference",
+                })
 
     logger.info(f"Cross-reference found {len(findings)} gaps")
 
@@ -197,23 +290,19 @@ def cross_reference_node(state: AgentState) -> dict:
     }
 
 
-def dropoff_node(state: AgentState) -> dict:
+async def dropoff_node(state: AgentState) -> dict:
     prior_conditions = state.get("prior_year_conditions", [])
     current_conditions = state.get("conditions", [])
 
     findings = []
 
-    current_names = [
-        cond.get("name_lower", cond.get("name", "").lower())
-        for cond in current_conditions
-    ]
+    current_names = [cond["name_lower"] for cond in current_conditions]
 
     for prior in prior_conditions:
-        prior_name = prior.get("name_lower", prior.get("name", "").lower())
+        prior_name = prior["name_lower"]
 
         # Only check chronic conditions
-        is_chronic = any(keyword in prior_name for keyword in CHRONIC_CONDITIONS)
-        if not is_chronic:
+        if not _CHRONIC_RE.search(prior_name):
             continue
 
         # Check if missing
@@ -241,25 +330,27 @@ def dropoff_node(state: AgentState) -> dict:
     }
 
 
-def symptom_cluster_node(state: AgentState) -> dict:
+async def symptom_cluster_node(state: AgentState) -> dict:
     symptoms = state.get("symptoms", [])
     conditions = state.get("conditions", [])
 
     findings = []
-    symptom_lower = [s.lower() for s in symptoms]
+
+    # One scan per distinct patient symptom covers every cluster keyword;
+    # symptoms pulled from many notes repeat heavily
+    present = set()
+    for symptom in {s.lower() for s in symptoms}:
+        present |= _SYMPTOM_MATCHER.find_all(symptom)
 
     for cluster_name, cluster in SYMPTOM_CLUSTERS.items():
+        target = cluster["condition"]
+
         # Skip documented conditions
-        if _has_condition(conditions, [cluster["condition"]]):
+        if _has_condition(conditions, (target,)):
             continue
 
         # Count matches
-        matches = []
-        for symptom in cluster["symptoms"]:
-            for patient_symptom in symptom_lower:
-                if symptom in patient_symptom:
-                    matches.append(symptom)
-                    break
+        matches = [symptom for symptom in cluster["symptoms"] if symptom in present]
 
         if len(matches) >= cluster["min_matches"]:
             findings.append({
@@ -267,8 +358,8 @@ def symptom_cluster_node(state: AgentState) -> dict:
                 "severity": cluster["severity"],
                 "cluster": cluster_name,
                 "matching_symptoms": matches,
-                "suggested_condition": cluster["condition"],
-                "signal": f"Symptoms ({', '.join(matches)}) suggest possible {cluster['condition']}",
+                "suggested_condition": target,
+                "signal": f"Symptoms ({', '.join(matches)}) suggest possible {target}",
                 "strategy": "symptom_cluster",
             })
 
@@ -280,7 +371,7 @@ def symptom_cluster_node(state: AgentState) -> dict:
     }
 
 
-def contradiction_node(state: AgentState) -> dict:
+async def contradiction_node(state: AgentState) -> dict:
     medications = state.get("medications", [])
     conditions = state.get("conditions", [])
 
@@ -292,14 +383,13 @@ def contradiction_node(state: AgentState) -> dict:
         if status not in ["resolved", "inactive", "remission"]:
             continue
 
-        cond_name = cond.get("name_lower", cond.get("name", "").lower())
+        treating = _meds_treating(cond["name_lower"])
+        if not treating:
+            continue
 
-        # Find meds treating this condition
+        # Active meds that treat this condition
         for med in medications:
-            med_name = med.get("name_lower", med.get("name", "").lower())
-            expected_conditions = MED_CONDITION_MAP.get(med_name, [])
-
-            if any(exp in cond_name or cond_name in exp for exp in expected_conditions):
+            if med["name_lower"] in treating:
                 findings.append({
                     "type": "contradiction",
                     "severity": "medium",
@@ -318,6 +408,6 @@ def contradiction_node(state: AgentState) -> dict:
     }
 
 
-def aggregate_findings_node(state: AgentState) -> dict:
+async def aggregate_findings_node(state: AgentState) -> dict:
     logger.info(f"Detection complete: {len(state.get('findings', []))} findings from {len(state.get('completed_strategies', []))} strategies")
     return {}
@@ -1,5 +1,7 @@
+import heapq
 import logging
 import os
+from operator import itemgetter
 
 from agents.state import AgentState
 from config import INDEX_DIR, PATIENT_DATA_PATH, CHUNKS_PER_QUERY, MAX_TOTAL_CHUNKS
@@ -75,37 +77,60 @@ def load_documents_node(state: AgentState) -> dict:
 
 def _retrieve_relevant_chunks(index, patient_id: str) -> list:
     seen_ids = set()
-    all_results = []
-
-    for query in CLINICAL_SEARCH_QUERIES:
-        try:
-            results = index.search(
-                query=query,
-                top_k=CHUNKS_PER_QUERY,
-                patient_id=patient_id,
-                mode="hybrid"
-            )
-
-            for result in results:
-                chunk_id = result.chunk.id
-                if chunk_id not in seen_ids:
-                    seen_ids.add(chunk_id)
-                    all_results.append((result.score, result.chunk))
-
-        except Exception as e:
-            logger.warning(f"Search failed for query '{query[:30]}...': {e}")
-            continue
+    # Bounded min-heap of (score, -arrival, chunk): the root is the weakest
+    # kept result, and on equal scores the later arrival is dropped first
+    heap = []
 
-    # Sort by score, take top
-    all_results.sort(key=lambda x: x[0], reverse=True)
-    top_chunks = [chunk for _, chunk in all_results[:MAX_TOTAL_CHUNKS]]
+    try:
+        # All queries in one call: embeddings are encoded as a single batch
+        batch = index.search_batch(
+            queries=CLINICAL_SEARCH_QUERIES,
+            top_k=CHUNKS_PER_QUERY,
+            patient_id=patient_id,
+            mode="hybrid"
+        )
+    except Exception as e:
+        # Retry one query at a time so a single failure only loses that query
+        logger.warning(f"Batched search failed, retrying per query: {e}")
+        batch = [_search_one(index, query, patient_id) for query in CLINICAL_SEARCH_QUERIES]
+
+    for results in batch:
+        for result in results:
+            chunk_id = result.chunk.id
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+
+            entry = (result.score, -len(seen_ids), result.chunk)
+            if len(heap) < MAX_TOTAL_CHUNKS:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heappushpop(heap, entry)
+
+    top = sorted(heap, key=itemgetter(0, 1), reverse=True)
+    top_chunks = [chunk for _, _, chunk in top]
 
     logger.info(f"Retrieved {len(top_chunks)} unique chunks from {len(CLINICAL_SEARCH_QUERIES)} queries")
     return top_chunks
 
 
+def _search_one(index, query: str, patient_id: str) -> list:
+    try:
+        return index.search(
+            query=query,
+            top_k=CHUNKS_PER_QUERY,
+            patient_id=patient_id,
+            mode="hybrid"
+        )
+    except Exception as e:
+        logger.warning(f"Search failed for query '{query[:30]}...': {e}")
+        return []
+
+
 def _chunks_to_documents(chunks: list) -> list[dict]:
     docs_by_source = {}
+    parts_by_source = {}
+    seen_by_source = {}
 
     for chunk in chunks:
         source = chunk.metadata.get("source_file", "unknown")
@@ -115,12 +140,19 @@ def _chunks_to_documents(chunks: list) -> list[dict]:
                 "type": chunk.metadata.get("doc_type", "other"),
                 "date": chunk.metadata.get("date"),
                 "source": os.path.basename(source),
-                "content": chunk.content,
             }
-        else:
-            # Append chunk (avoid dupes)
-            if chunk.content not in docs_by_source[source]["content"]:
-                docs_by_source[source]["content"] += "\n\n" + chunk.content
+            parts_by_source[source] = []
+            seen_by_source[source] = set()
+
+        # Skip duplicate chunks (set lookup instead of scanning the joined text)
+        if chunk.content in seen_by_source[source]:
+            continue
+        seen_by_source[source].add(chunk.content)
+        parts_by_source[source].append(chunk.content)
+
+    # Join once per document
+    for source, doc in docs_by_source.items():
+        doc["content"] = "\n\n".join(parts_by_source[source])
 
     return list(docs_by_source.values())
 
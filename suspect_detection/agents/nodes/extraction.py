@@ -1,4 +1,6 @@
+import io
 import logging
+import sys
 
 from agents.state import AgentState
 from agents.models import EXTRACTION_SCHEMA
@@ -36,7 +38,7 @@ Focus on clinical accuracy. Do not infer conditions not explicitly stated."""
 MAX_DOCUMENT_LENGTH = 20000
 
 
-def extraction_node(state: AgentState) -> dict:
+async def extraction_node(state: AgentState) -> dict:
     documents = state.get("documents", [])
     patient_id = state.get("patient_id", "unknown")
 
@@ -51,18 +53,30 @@ def extraction_node(state: AgentState) -> dict:
             "next_step": "supervisor",
         }
 
-    # Combine documents
-    combined_text = f"Patient: {patient_id}\n\n"
+    # Combine documents, stopping once the length budget is exceeded
+    buf = io.StringIO()
+    buf.write(f"Patient: {patient_id}\n\n")
+    included = 0
     for doc in documents:
         doc_type = doc.get("type", "document")
         doc_date = doc.get("date", "")
-        content = doc.get("content", "")
 
-        combined_text += f"=== {doc_type.upper()} ({doc_date}) ===\n{content}\n\n"
+        buf.write(f"=== {doc_type.upper()} ({doc_date}) ===\n")
+        buf.write(doc.get("content", ""))
+        buf.write("\n\n")
+        included += 1
+        if buf.tell() > MAX_DOCUMENT_LENGTH:
+            break
+
+    total = buf.tell()
+    combined_text = buf.getvalue()
 
     # Truncate
-    if len(combined_text) > MAX_DOCUMENT_LENGTH:
-        logger.warning(f"Truncating documents from {len(combined_text)} to {MAX_DOCUMENT_LENGTH} chars")
+    if total > MAX_DOCUMENT_LENGTH:
+        logger.warning(
+            f"Truncating documents to {MAX_DOCUMENT_LENGTH} chars "
+            f"({included} of {len(documents)} documents included)"
+        )
         combined_text = combined_text[:MAX_DOCUMENT_LENGTH] + "\n... [truncated]"
 
     logger.info(f"Extracting clinical entities from {len(documents)} documents ({len(combined_text)} chars)")
@@ -70,7 +84,7 @@ def extraction_node(state: AgentState) -> dict:
     try:
         client = get_gemini_client()
         # Use Flash for extraction
-        result = client.generate_structured(
+        result = await client.generate_structured_async(
             prompt=f"Extract clinical entities from these documents:\n\n{combined_text}",
             response_schema=EXTRACTION_SCHEMA,
             model=GEMINI_FLASH_MODEL,
@@ -111,22 +125,39 @@ def extraction_node(state: AgentState) -> dict:
         }
 
 
+def _intern(value):
+    # Share one string object for repeated names/codes across turns and checkpoints
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _strip_if_needed(value: str) -> str:
+    # Most model output has no surrounding whitespace; skip the copy then
+    if value and (value[0].isspace() or value[-1].isspace()):
+        return value.strip()
+    return value
+
+
+def _lower_if_needed(value: str) -> str:
+    # islower() scans without allocating; names like "metformin" are already lowercase
+    return value if value.islower() else value.lower()
+
+
 def normalize_medications(meds: list[dict]) -> list[dict]:
     normalized = []
     seen = set()
 
     for med in meds:
-        name_original = med.get("name", "").strip()
-        name_lower = name_original.lower()
+        name_original = _strip_if_needed(med.get("name", ""))
+        name_lower = _lower_if_needed(name_original)
         if not name_lower or name_lower in seen:
             continue
 
         seen.add(name_lower)
         normalized.append({
-            "name": name_original,
-            "name_lower": name_lower,
+            "name": _intern(name_original),
+            "name_lower": _intern(name_lower),
             "dose": med.get("dose", ""),
-            "frequency": med.get("frequency", ""),
+            "frequency": _intern(med.get("frequency", "")),
         })
 
     return normalized
@@ -137,7 +168,8 @@ def normalize_labs(labs: list[dict]) -> list[dict]:
     seen = set()
 
     for lab in labs:
-        name = lab.get("name", "").strip().lower()
+        name_original = _strip_if_needed(lab.get("name", ""))
+        name = _lower_if_needed(name_original)
         if not name:
             continue
 
@@ -156,11 +188,11 @@ def normalize_labs(labs: list[dict]) -> list[dict]:
                 value = None
 
         normalized.append({
-            "name": lab.get("name", "").strip(),
-            "name_lower": name,
+            "name": _intern(name_original),
+            "name_lower": _intern(name),
             "value": value,
-            "unit": lab.get("unit", ""),
-            "flag": lab.get("flag", "normal"),
+            "unit": _intern(lab.get("unit", "")),
+            "flag": _intern(lab.get("flag", "normal")),
         })
 
     return normalized
@@ -171,17 +203,17 @@ def normalize_conditions(conditions: list[dict]) -> list[dict]:
     seen = set()
 
     for cond in conditions:
-        name_original = cond.get("name", "").strip()
-        name_lower = name_original.lower()
+        name_original = _strip_if_needed(cond.get("name", ""))
+        name_lower = _lower_if_needed(name_original)
         if not name_lower or name_lower in seen:
             continue
 
         seen.add(name_lower)
         normalized.append({
-            "name": name_original,
-            "name_lower": name_lower,
-            "icd10": cond.get("icd10", ""),
-            "status": cond.get("status", "active"),
+            "name": _intern(name_original),
+            "name_lower": _intern(name_lower),
+            "icd10": _intern(cond.get("icd10", "")),
+            "status": _intern(cond.get("status", "active")),
             "year": cond.get("year"),
         })
 
@@ -1,8 +1,6 @@
 import logging
 
 from agents.state import AgentState
-from agents.gemini_client import get_gemini_client
-from config import GEMINI_FLASH_MODEL
 
 logger = logging.getLogger(__name__)
 
@@ -35,17 +33,18 @@ Try:
 - `Analyze patient CVD-2025-001` - analyze a specific patient
 - `What is diabetes?` - ask a medical question"""
 
-FALLBACK_SYSTEM_INSTRUCTION = (
-    "You are a clinical assistant. Answer helpfully and briefly. "
-    "If the user seems to want patient analysis, guide them to use "
-    "'Analyze patient <ID>' format."
-)
+FALLBACK_RESPONSE = """I'm not sure how to help with that.
+
+Try:
+- `List patients` - see available patients
+- `Analyze patient CVD-2025-001` - analyze a specific patient
+- `Tell me about CVD-2025-001's medications` - view a patient's records
+- `What is diabetes?` - ask a medical question"""
 
 
 def general_question_node(state: AgentState) -> dict:
     """Handle general responses: greetings, help, errors, clarifications, and fallback."""
     response_type = state.get("response_type", "fallback")
-    user_message = state.get("user_message", "")
 
     logger.info(f"General response for type: {response_type}")
 
@@ -62,22 +61,5 @@ def general_question_node(state: AgentState) -> dict:
     if response_type == "error":
         return {"response": ERROR_RESPONSE, "next_step": "end"}
 
-    # Fallback: use LLM for unknown intents
-    try:
-        client = get_gemini_client()
-        response = client.generate(
-            prompt=user_message,
-            model=GEMINI_FLASH_MODEL,
-            system_instruction=FALLBACK_SYSTEM_INSTRUCTION,
-        )
-        return {"response": response, "next_step": "end"}
-
-    except Exception as e:
-        logger.error(f"General response failed: {e}")
-        return {
-            "response": "I'm not sure how to help with that. Try 'List patients' or 'Analyze patient CVD-2025-001'.",
-            "error": str(e),
-            "next_step": "end",
-        }
-
-        
+    # Fallback: canned guidance, no LLM roundtrip
+    return {"response": FALLBACK_RESPONSE, "next_step": "end"}
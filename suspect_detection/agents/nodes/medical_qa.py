@@ -17,16 +17,17 @@ Keep responses focused and professional. Use medical terminology appropriately.
 If the question is outside your knowledge or requires patient-specific advice, say so.
 """
 
-def medical_qa_node(state: AgentState) -> dict:
+async def medical_qa_node(state: AgentState) -> dict:
     user_message = state.get("user_message", "")
     logger.info(f"Answering medical question: {user_message[:50]}...")
 
     try:
         client = get_gemini_client()
-        response = client.generate(
+        response = await client.generate_async(
             prompt=f"Question: {user_message}",
             model=GEMINI_FLASH_MODEL,
             system_instruction=MEDICAL_QA_PROMPT,
+            use_context_cache=True,
         )
         return {"response": response, "next_step": "end"}
 
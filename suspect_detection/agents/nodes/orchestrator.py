@@ -1,15 +1,74 @@
+import asyncio
 import logging
-from difflib import SequenceMatcher
+import re
+from bisect import bisect_right
+import sys
+import threading
+import time
+
+from rapidfuzz import fuzz, process
 
 from agents.state import AgentState
 from agents.models import INTENT_SCHEMA
-from agents.gemini_client import get_gemini_client
-from config import GEMINI_FLASH_MODEL, PATIENT_DATA_PATH
-from retrieval.search import get_search_index
-from retrieval.loader import DocumentLoader
+from agents.gemini_client import StructuredBatcher, get_gemini_client
+from config import (
+    GEMINI_FLASH_MODEL,
+    PATIENT_DATA_PATH,
+    PATIENT_CACHE_TTL,
+    INTENT_BATCHING,
+    INTENT_BATCH_MAX,
+    INTENT_BATCH_WAIT,
+    MAX_BATCH_PATIENTS,
+)
 
 logger = logging.getLogger(__name__)
 
+# Patient roster cache, refreshed from the search index every PATIENT_CACHE_TTL seconds
+_PATIENT_CACHE = {
+    "ts": 0.0,
+    "patients": (),
+    "patient_set": frozenset(),
+    "lowered": (),
+    "substring_index": ("", []),
+    "lists": {},
+}
+_patient_cache_lock = threading.Lock()
+
+# Shared across sessions so concurrent turns can be classified in one call
+_intent_batcher = None
+_intent_batcher_lock = threading.Lock()
+
+# Deterministic fast path for unambiguous commands; anything else goes to the LLM
+PATIENT_ID_RE = re.compile(r"\b([A-Z]{2,10}-\d{4}-\d{3})\b", re.I)
+# Letters then digits anywhere in an uppercased ID; near misses like
+# CVD2025-001 or CVD-2025-01 still have it
+_PATIENT_ID_SHAPE = re.compile(r"[A-Z]+-?\d")
+ANALYZE_RE = re.compile(
+    r"^\s*(?:please\s+)?(?:analy[sz]e|run detection(?:\s+on)?|detect|find gaps(?:\s+for)?)"
+    r"(?:\s+patient)?\s+" + PATIENT_ID_RE.pattern + r"\s*[.!?]*\s*$",
+    re.I,
+)
+# Questions about undocumented conditions need detection, not a records lookup
+DETECTION_QUESTION_RE = re.compile(
+    r"\b(?:(?:undocumented|undiagnosed|missing|suspected|potential)\s+(?:conditions?|diagnos[ie]s)"
+    r"|conditions?\s+(?:that\s+)?(?:might|may|could)\s+be\s+missing"
+    r"|gaps?\s+in\s+(?:the\s+)?(?:documentation|records?)"
+    # Only when a condition or diagnosis is what's undocumented, not e.g. a dose
+    r"|(?:conditions?|diagnos[ie]s)\b.{0,40}\bnot\s+(?:yet\s+)?documented)\b",
+    re.I,
+)
+LIST_RE = re.compile(
+    r"^\s*(?:(?:list|show)(?:\s+(?:all|available))?\s+patients?"
+    r"|(?:what|which)\s+patients\s+(?:are\s+)?(?:available|are\s+there))\s*[.!?]*\s*$",
+    re.I,
+)
+GREETING_RE = re.compile(
+    r"^\s*(?:(?:hi|hello|hey)(?:\s+there)?|thanks|thank you|help|what can you do)\s*[.!?]*\s*$",
+    re.I,
+)
+
+PROMPT_PREFIX = "User message: "
+
 
 INTENT_PROMPT = """You are a clinical suspect detection assistant. Classify the user's intent.
 
@@ -61,127 +120,345 @@ INTENT_PROMPT = """You are a clinical suspect detection assistant. Classify the
 """
 
 
-def orchestrator_node(state: AgentState) -> dict:
+async def orchestrator_node(state: AgentState) -> dict:
     user_message = state.get("user_message", "").strip()
-    logger.info(f"Orchestrator processing: {user_message[:50]}...")
+    logger.info("Orchestrator processing: %.50s...", user_message)
 
-    available_patients = _get_available_patients()
+    # Roster load (index I/O on a cold cache) overlaps the intent call
+    patients_task = asyncio.create_task(asyncio.to_thread(_get_available_patients))
 
     # Intent classification
     try:
-        client = get_gemini_client()
-        result = client.generate_structured(
-            prompt=f"User message: {user_message}",
-            response_schema=INTENT_SCHEMA,
-            model=GEMINI_FLASH_MODEL,
-            system_instruction=INTENT_PROMPT,
-        )
+        result = _classify_intent_fast(user_message)
+        if result is None:
+            result = await _classify_intent_llm(PROMPT_PREFIX + user_message)
+            # The model sometimes drops an ID that is written out verbatim
+            if not result.get("patient_id"):
+                match = PATIENT_ID_RE.search(user_message)
+                if match:
+                    result = {**result, "patient_id": match.group(1)}
+        available_patients = await patients_task
 
         intent = result.get("intent", "greeting")
-        patient_id = result.get("patient_id")
-        partial_patient_id = result.get("partial_patient_id", "")
-        needs_clarification = result.get("needs_clarification", False)
-
-        logger.info(f"Intent: {intent}, patient_id: {patient_id}, partial: {partial_patient_id}")
-
-        if intent == "analyze_patient":
-            # Fallback to state for follow-up analysis requests
-            effective_patient_id = patient_id or state.get("patient_id")
-
-            if effective_patient_id:
-                effective_patient_id, error = _validate_patient_exists(effective_patient_id, available_patients)
-                if error:
-                    suggestion = _find_similar_patient(effective_patient_id, available_patients)
-                    if suggestion:
-                        error["response"] += f"\n\nTry: `Analyze patient {suggestion}`"
-                    return error
-                return {
-                    "next_step": "analyze",
-                    "patient_id": effective_patient_id,
-                    "original_query": user_message,
-                }
-            return _handle_patient_clarification("", available_patients)
-
-        elif intent == "clarify_patient" or needs_clarification:
-            return _handle_patient_clarification(partial_patient_id or patient_id, available_patients)
-
-        elif intent == "list_patients":
-            return {"next_step": "list_patients"}
-
-        elif intent == "patient_info_request" and patient_id:
-            patient_id, error = _validate_patient_exists(patient_id, available_patients)
-            if error:
-                return error
-
-            # Check existing data
-            existing_patient_id = state.get("patient_id")
-            has_data = state.get("medications") or state.get("labs") or state.get("conditions")
-
-            if existing_patient_id == patient_id and has_data:
-                # Route to answer_query
-                return {
-                    "next_step": "answer_query",
-                    "patient_id": patient_id,
-                    "original_query": user_message,
-                }
-            else:
-                # Retrieve data first
-                return {
-                    "next_step": "retrieve_info",
-                    "patient_id": patient_id,
-                    "original_query": user_message,
-                    "info_request": True,  # Flag to skip detection
-                }
-
-        elif intent == "followup_question":
-            # Route to answer_query
-            return {
-                "next_step": "answer_query",
-                "patient_id": state.get("patient_id"),
-                "original_query": user_message,
-            }
+        logger.info(
+            "Intent: %s, patient_id: %s, partial: %s",
+            intent, result.get("patient_id"), result.get("partial_patient_id", ""),
+        )
 
-        elif intent == "medical_question":
-            # Route to dedicated medical QA node
-            return {"next_step": "medical_qa"}
+        # An incomplete ID needs clarifying whatever the intent, unless we're analyzing
+        if intent != "analyze_patient" and result.get("needs_clarification", False):
+            intent = "clarify_patient"
 
-        elif intent == "greeting":
-            # Handles greetings, help requests, and system capability questions
-            return {"next_step": "general_response", "response_type": "greeting"}
-
-        else:
-            # Fallback - route to general response node
-            return {"next_step": "general_response", "response_type": "fallback"}
+        handler = _INTENT_HANDLERS.get(intent, _route_fallback)
+        return handler(state, result, user_message, available_patients)
 
     except Exception as e:
-        logger.error(f"Intent classification failed: {e}")
+        logger.error("Intent classification failed: %s", e)
         return {
             "next_step": "general_response",
             "response_type": "error",
             "error": str(e),
         }
+    finally:
+        # If classification failed first, the roster task was never awaited
+        if not patients_task.done():
+            patients_task.cancel()
+        elif not patients_task.cancelled():
+            patients_task.exception()  # Mark any error as retrieved
+
+
+# Static route updates, shared across turns. LangGraph only reads node
+# output, so these are never mutated; build a new dict to change one.
+_LIST_ROUTE = {"next_step": "list_patients"}
+_MEDICAL_QA_ROUTE = {"next_step": "medical_qa"}
+_GREETING_ROUTE = {"next_step": "general_response", "response_type": "greeting"}
+_FALLBACK_ROUTE = {"next_step": "general_response", "response_type": "fallback"}
+
+
+def _route_analyze(state, result, user_message, available_patients) -> dict:
+    # Several IDs in one message -> analyze them side by side
+    patient_ids = list(dict.fromkeys(pid.upper() for pid in PATIENT_ID_RE.findall(user_message)))
+    if len(patient_ids) > 1:
+        return _route_batch_analyze(patient_ids, user_message, available_patients)
+
+    # Fallback to state for follow-up analysis requests
+    effective_patient_id = result.get("patient_id") or state.get("patient_id")
+
+    if effective_patient_id:
+        effective_patient_id, error = _validate_patient_exists(effective_patient_id, available_patients)
+        if error:
+            if error["response_type"] != "patient_not_found":
+                return error
+            suggestion = _find_similar_patient(effective_patient_id, available_patients)
+            if suggestion:
+                error = {**error, "response": error["response"] + f"\n\nTry: `Analyze patient {suggestion}`"}
+            return error
+        return {
+            "next_step": "analyze",
+            "patient_id": effective_patient_id,
+            "original_query": user_message,
+        }
+    return _handle_patient_clarification("", available_patients)
+
+
+def _route_batch_analyze(patient_ids: list[str], user_message: str, available_patients) -> dict:
+    if len(patient_ids) > MAX_BATCH_PATIENTS:
+        return {
+            "next_step": "general_response",
+            "response_type": "patient_clarification",
+            "response": f"I can analyze up to {MAX_BATCH_PATIENTS} patients at once; "
+                        f"you listed {len(patient_ids)}. Please split the request.",
+        }
+
+    validated = []
+    for patient_id in patient_ids:
+        patient_id, error = _validate_patient_exists(patient_id, available_patients)
+        if error:
+            return error
+        validated.append(patient_id)
+
+    return {
+        "next_step": "batch_analyze",
+        "patient_ids": validated,
+        "original_query": user_message,
+    }
+
+
+def _route_clarify(state, result, user_message, available_patients) -> dict:
+    partial_id = result.get("partial_patient_id", "") or result.get("patient_id")
+    return _handle_patient_clarification(partial_id, available_patients)
+
+
+def _route_list(state, result, user_message, available_patients) -> dict:
+    return _LIST_ROUTE
+
+
+def _route_info_request(state, result, user_message, available_patients) -> dict:
+    patient_id = result.get("patient_id")
+    if not patient_id:
+        return _route_fallback(state, result, user_message, available_patients)
+
+    patient_id, error = _validate_patient_exists(patient_id, available_patients)
+    if error:
+        return error
+
+    # Check existing data
+    existing_patient_id = state.get("patient_id")
+    has_data = state.get("medications") or state.get("labs") or state.get("conditions")
+
+    if existing_patient_id == patient_id and has_data:
+        # Route to answer_query
+        return {
+            "next_step": "answer_query",
+            "patient_id": patient_id,
+            "original_query": user_message,
+        }
+    # Retrieve data first
+    return {
+        "next_step": "retrieve_info",
+        "patient_id": patient_id,
+        "original_query": user_message,
+        "info_request": True,  # Flag to skip detection
+    }
+
+
+def _route_followup(state, result, user_message, available_patients) -> dict:
+    return {
+        "next_step": "answer_query",
+        "patient_id": state.get("patient_id"),
+        "original_query": user_message,
+    }
+
+
+def _route_medical_question(state, result, user_message, available_patients) -> dict:
+    # Dedicated medical QA node
+    return _MEDICAL_QA_ROUTE
+
+
+def _route_greeting(state, result, user_message, available_patients) -> dict:
+    # Handles greetings, help requests, and system capability questions
+    return _GREETING_ROUTE
+
+
+def _route_fallback(state, result, user_message, available_patients) -> dict:
+    return _FALLBACK_ROUTE
 
 
-def _get_available_patients() -> list[str]:
+# intent -> handler(state, result, user_message, available_patients)
+_INTENT_HANDLERS = {
+    "analyze_patient": _route_analyze,
+    "clarify_patient": _route_clarify,
+    "list_patients": _route_list,
+    "patient_info_request": _route_info_request,
+    "followup_question": _route_followup,
+    "medical_question": _route_medical_question,
+    "greeting": _route_greeting,
+}
+
+
+async def _classify_intent_llm(prompt: str) -> dict:
+    if INTENT_BATCHING:
+        return await _get_intent_batcher().submit(prompt)
+    return await get_gemini_client().generate_structured_async(
+        prompt=prompt,
+        response_schema=INTENT_SCHEMA,
+        model=GEMINI_FLASH_MODEL,
+        system_instruction=INTENT_PROMPT,
+        use_context_cache=True,
+    )
+
+
+def _get_intent_batcher() -> StructuredBatcher:
+    global _intent_batcher
+    with _intent_batcher_lock:
+        if _intent_batcher is None:
+            _intent_batcher = StructuredBatcher(
+                get_gemini_client(),
+                system_instruction=INTENT_PROMPT,
+                response_schema=INTENT_SCHEMA,
+                model=GEMINI_FLASH_MODEL,
+                max_batch=INTENT_BATCH_MAX,
+                max_wait=INTENT_BATCH_WAIT,
+            )
+        return _intent_batcher
+
+
+def _classify_intent_fast(user_message: str) -> dict | None:
+    """Classify obvious commands locally.
+
+    Returns:
+        A result dict shaped like the LLM output, or None if the message is ambiguous
+    """
+    match = ANALYZE_RE.match(user_message)
+    if match:
+        return {"intent": "analyze_patient", "patient_id": match.group(1), "reasoning": "rule: analyze"}
+    if LIST_RE.match(user_message):
+        return {"intent": "list_patients", "reasoning": "rule: list"}
+    if GREETING_RE.match(user_message):
+        return {"intent": "greeting", "reasoning": "rule: greeting"}
+    if DETECTION_QUESTION_RE.search(user_message):
+        # Without an ID in the message the node falls back to the session's patient
+        match = PATIENT_ID_RE.search(user_message)
+        return {
+            "intent": "analyze_patient",
+            "patient_id": match.group(1) if match else None,
+            "reasoning": "rule: detection question",
+        }
+    return None
+
+
+def _get_available_patients() -> tuple[str, ...]:
+    with _patient_cache_lock:
+        if _PATIENT_CACHE["ts"] and time.monotonic() - _PATIENT_CACHE["ts"] < PATIENT_CACHE_TTL:
+            return _PATIENT_CACHE["patients"]
+
+    # Deferred so turns that never touch patient data skip loading the retrieval stack
+    from retrieval.search import get_search_index
+
     try:
         index = get_search_index()
-        return index.list_patients()
+        # Interned so membership checks against parsed IDs mostly hit on identity
+        patients = tuple(sys.intern(p) for p in index.list_patients())
     except Exception as e:
-        logger.warning(f"Could not load patient list: {e}")
+        logger.warning("Could not load patient list: %s", e)
+        return ()
+
+    with _patient_cache_lock:
+        _PATIENT_CACHE["ts"] = time.monotonic()
+        _PATIENT_CACHE["patients"] = patients
+        _PATIENT_CACHE["patient_set"] = frozenset(patients)
+        _PATIENT_CACHE["lowered"] = tuple(p.lower() for p in patients)
+        _PATIENT_CACHE["substring_index"] = _build_substring_index(_PATIENT_CACHE["lowered"])
+        _PATIENT_CACHE["lists"] = {n: _format_patient_list(patients, n) for n in (5, 10)}
+    return patients
+
+
+def invalidate_patient_cache() -> None:
+    """Force the next roster lookup to hit the search index (e.g. after ingest)."""
+    with _patient_cache_lock:
+        _PATIENT_CACHE["ts"] = 0.0
+
+
+def _format_patient_list(patients, limit: int) -> str:
+    return "\n".join(["- " + p for p in patients[:limit]])
+
+
+def _patient_list(available, limit: int) -> str:
+    # Bullet list of the first `limit` patients, prebuilt for the cached roster
+    with _patient_cache_lock:
+        if available is _PATIENT_CACHE["patients"] and limit in _PATIENT_CACHE["lists"]:
+            return _PATIENT_CACHE["lists"][limit]
+    return _format_patient_list(available, limit)
+
+
+def _patient_set(available) -> frozenset[str]:
+    # O(1) membership for the cached roster
+    with _patient_cache_lock:
+        if available is _PATIENT_CACHE["patients"]:
+            return _PATIENT_CACHE["patient_set"]
+    return frozenset(available)
+
+
+def _lowered_patients(available) -> tuple[str, ...]:
+    # Reuse the precomputed lowercase IDs when given the cached roster
+    with _patient_cache_lock:
+        if available is _PATIENT_CACHE["patients"]:
+            return _PATIENT_CACHE["lowered"]
+    return tuple(p.lower() for p in available)
+
+
+def _build_substring_index(lowered) -> tuple[str, list[int]]:
+    # NUL-joined lowercase IDs plus each ID's start offset in the joined string
+    starts = []
+    pos = 0
+    for patient_lower in lowered:
+        starts.append(pos)
+        pos += len(patient_lower) + 1
+    return "\0".join(lowered), starts
+
+
+def _substring_matches(query_lower: str, available, limit: int = None) -> list[str]:
+    """Patients whose lowercase ID contains query_lower, in roster order.
+
+    Uses str.find over one joined string instead of testing each ID in turn.
+    """
+    with _patient_cache_lock:
+        cached = available is _PATIENT_CACHE["patients"]
+        if cached:
+            haystack, starts = _PATIENT_CACHE["substring_index"]
+    if not cached:
+        haystack, starts = _build_substring_index(_lowered_patients(available))
+
+    # IDs never contain the separator, so such a query can't match
+    if not starts or "\0" in query_lower:
         return []
 
+    matches = []
+    pos = haystack.find(query_lower)
+    while pos != -1:
+        i = bisect_right(starts, pos) - 1
+        matches.append(available[i])
+        if len(matches) == limit or i + 1 == len(starts):
+            break
+        pos = haystack.find(query_lower, starts[i + 1])
+    return matches
+
 
-def _validate_patient_exists(patient_id: str, available_patients: list[str]) -> tuple[str, dict | None]:
+def _validate_patient_exists(patient_id: str, available_patients: tuple[str, ...]) -> tuple[str, dict | None]:
     """Validate patient ID exists and return (upper_id, error_response).
 
     Returns:
         (patient_id_upper, None) if valid
         (patient_id_upper, error_dict) if invalid
     """
-    patient_id = patient_id.upper()
-    if not available_patients or patient_id in available_patients:
+    patient_id = sys.intern(patient_id.upper())
+    if not available_patients or patient_id in _patient_set(available_patients):
         return patient_id, None
 
+    # Nothing ID-like to fuzzy match (e.g. "CVD" or "2025"); ask instead
+    if not _PATIENT_ID_SHAPE.search(patient_id):
+        return patient_id, _handle_patient_clarification(patient_id, available_patients)
+
     suggestion = _find_similar_patient(patient_id, available_patients)
     if suggestion:
         return patient_id, {
@@ -193,35 +470,39 @@ def _validate_patient_exists(patient_id: str, available_patients: list[str]) ->
         "next_step": "general_response",
         "response_type": "patient_not_found",
         "response": f"Patient '{patient_id}' not found.\n\nAvailable patients:\n"
-                    + "\n".join(f"- {p}" for p in available_patients[:5]),
+                    + _patient_list(available_patients, 5),
     }
 
 
-def _find_similar_patient(query: str, available: list[str], threshold: float = 0.6) -> str | None:
+def _find_similar_patient(query: str, available: tuple[str, ...], threshold: float = 0.6) -> str | None:
     if not available:
         return None
 
-    query_lower = query.lower()
-    best_match = None
-    best_score = 0
+    # Exact hit
+    query_upper = query.upper()
+    if query_upper in _patient_set(available):
+        return query_upper
 
-    for patient_id in available:
-        # Substring match
-        if query_lower in patient_id.lower():
-            return patient_id
+    query_lower = query.lower()
 
-        score = SequenceMatcher(None, query_lower, patient_id.lower()).ratio()
-        if score > best_score and score >= threshold:
-            best_score = score
-            best_match = patient_id
+    # Substring match
+    substring = _substring_matches(query_lower, available, limit=1)
+    if substring:
+        return substring[0]
 
-    return best_match
+    # Fuzzy match in C++; score_cutoff lets it skip hopeless candidates early
+    match = process.extractOne(
+        query_lower, _lowered_patients(available), scorer=fuzz.ratio, score_cutoff=threshold * 100
+    )
+    if match is None:
+        return None
+    return available[match[2]]
 
 
-def _handle_patient_clarification(partial_id: str, available_patients: list[str]) -> dict:
+def _handle_patient_clarification(partial_id: str, available_patients: tuple[str, ...]) -> dict:
     if not partial_id:
         if available_patients:
-            patient_list = "\n".join(f"- {p}" for p in available_patients[:10])
+            patient_list = _patient_list(available_patients, 10)
             return {
                 "next_step": "general_response",
                 "response_type": "patient_clarification",
@@ -234,12 +515,7 @@ def _handle_patient_clarification(partial_id: str, available_patients: list[str]
         }
 
     # Find matches
-    matches = []
-    partial_lower = partial_id.lower()
-
-    for patient_id in available_patients:
-        if partial_lower in patient_id.lower():
-            matches.append(patient_id)
+    matches = _substring_matches(partial_id.lower(), available_patients)
 
     if len(matches) == 1:
         return {
@@ -256,7 +532,7 @@ def _handle_patient_clarification(partial_id: str, available_patients: list[str]
         }
     else:
         if available_patients:
-            patient_list = "\n".join(f"- {p}" for p in available_patients[:5])
+            patient_list = _patient_list(available_patients, 5)
             return {
                 "next_step": "general_response",
                 "response_type": "patient_clarification",
@@ -270,6 +546,9 @@ def _handle_patient_clarification(partial_id: str, available_patients: list[str]
 
 
 def list_patients_node(_state: AgentState) -> dict:
+    from retrieval.search import get_search_index
+    from retrieval.loader import DocumentLoader
+
     try:
         # Search index
         index = get_search_index()
@@ -289,7 +568,7 @@ def list_patients_node(_state: AgentState) -> dict:
         return {"response": response, "next_step": "end"}
 
     except Exception as e:
-        logger.error(f"Failed to list patients: {e}")
+        logger.error("Failed to list patients: %s", e)
         return {
             "response": f"Error listing patients: {str(e)}",
             "error": str(e),
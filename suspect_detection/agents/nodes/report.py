@@ -5,6 +5,70 @@ from agents.state import AgentState
 logger = logging.getLogger(__name__)
 
 
+SEVERITY_LABELS = {
+    "critical": "CRITICAL - Immediate Attention Required",
+    "high": "HIGH PRIORITY",
+    "medium": "MEDIUM PRIORITY",
+    "low": "LOW PRIORITY",
+}
+
+
+# Type-specific formatting; each returns the finding's lines joined
+def _format_medication_gap(i: int, finding: dict) -> str:
+    expected = finding.get("expected_conditions", [])
+    return (
+        f"{i}. **Medication without diagnosis**: {finding.get('medication', '')}\n"
+        f"   - Expected condition: {', '.join(expected[:2])}\n"
+        "   - *Action*: Verify if condition should be documented"
+    )
+
+
+def _format_lab_gap(i: int, finding: dict) -> str:
+    return (
+        f"{i}. **Abnormal lab without diagnosis**: {finding.get('lab', '')} = {finding.get('value', '')}\n"
+        f"   - Suggests: {finding.get('expected_condition', '')}\n"
+        "   - *Action*: Consider adding diagnosis if clinically appropriate"
+    )
+
+
+def _format_chronic_dropoff(i: int, finding: dict) -> str:
+    return (
+        f"{i}. **Chronic condition drop-off**: {finding.get('condition', '')}\n"
+        "   - Documented in prior year but missing from current\n"
+        "   - *Action*: Verify current status and update documentation"
+    )
+
+
+def _format_symptom_cluster(i: int, finding: dict) -> str:
+    symptoms = finding.get("matching_symptoms", [])
+    return (
+        f"{i}. **Symptom pattern detected**: {finding.get('suggested_condition', '')}\n"
+        f"   - Matching symptoms: {', '.join(symptoms)}\n"
+        "   - *Action*: Consider screening/workup if not already done"
+    )
+
+
+def _format_contradiction(i: int, finding: dict) -> str:
+    return (
+        f"{i}. **Documentation contradiction**\n"
+        f"   - {finding.get('signal', 'No details')}\n"
+        "   - *Action*: Clarify and resolve conflicting information"
+    )
+
+
+def _format_default(i: int, finding: dict) -> str:
+    return f"{i}. {finding.get('signal', 'No details')}"
+
+
+_FINDING_FORMATTERS = {
+    "medication_diagnosis_gap": _format_medication_gap,
+    "lab_diagnosis_gap": _format_lab_gap,
+    "chronic_condition_dropoff": _format_chronic_dropoff,
+    "symptom_cluster": _format_symptom_cluster,
+    "contradiction": _format_contradiction,
+}
+
+
 def report_node(state: AgentState) -> dict:
     """Generate analysis report from validated findings.
 
@@ -33,10 +97,10 @@ def report_node(state: AgentState) -> dict:
     logger.info(f"Generating report with {len(validated_findings)} findings")
 
     # Group findings by severity
-    by_severity = {"critical": [], "high": [], "medium": [], "low": []}
+    by_severity = {severity: [] for severity in SEVERITY_LABELS}
     for finding in validated_findings:
         severity = finding.get("severity", "low")
-        by_severity.get(severity, by_severity["low"]).append(finding)
+        by_severity[severity if severity in SEVERITY_LABELS else "low"].append(finding)
 
     # Build structured report
     report_lines = [
@@ -46,63 +110,19 @@ def report_node(state: AgentState) -> dict:
         "",
     ]
 
-    severity_labels = {
-        "critical": "CRITICAL - Immediate Attention Required",
-        "high": "HIGH PRIORITY",
-        "medium": "MEDIUM PRIORITY",
-        "low": "LOW PRIORITY",
-    }
-
-    for severity in ["critical", "high", "medium", "low"]:
+    for severity, label in SEVERITY_LABELS.items():
         findings = by_severity[severity]
         if not findings:
             continue
 
-        report_lines.append(f"### {severity_labels[severity]}")
+        report_lines.append(f"### {label}")
         report_lines.append("")
 
         for i, finding in enumerate(findings, 1):
-            finding_type = finding.get("type", "unknown")
-            signal = finding.get("signal", "No details")
-            confidence = finding.get("confidence", 0.5)
-
-            # Type-specific formatting
-            if finding_type == "medication_diagnosis_gap":
-                med = finding.get("medication", "")
-                expected = finding.get("expected_conditions", [])
-                report_lines.append(f"{i}. **Medication without diagnosis**: {med}")
-                report_lines.append(f"   - Expected condition: {', '.join(expected[:2])}")
-                report_lines.append(f"   - *Action*: Verify if condition should be documented")
-
-            elif finding_type == "lab_diagnosis_gap":
-                lab = finding.get("lab", "")
-                value = finding.get("value", "")
-                expected = finding.get("expected_condition", "")
-                report_lines.append(f"{i}. **Abnormal lab without diagnosis**: {lab} = {value}")
-                report_lines.append(f"   - Suggests: {expected}")
-                report_lines.append(f"   - *Action*: Consider adding diagnosis if clinically appropriate")
-
-            elif finding_type == "chronic_condition_dropoff":
-                condition = finding.get("condition", "")
-                report_lines.append(f"{i}. **Chronic condition drop-off**: {condition}")
-                report_lines.append(f"   - Documented in prior year but missing from current")
-                report_lines.append(f"   - *Action*: Verify current status and update documentation")
-
-            elif finding_type == "symptom_cluster":
-                symptoms = finding.get("matching_symptoms", [])
-                suggested = finding.get("suggested_condition", "")
-                report_lines.append(f"{i}. **Symptom pattern detected**: {suggested}")
-                report_lines.append(f"   - Matching symptoms: {', '.join(symptoms)}")
-                report_lines.append(f"   - *Action*: Consider screening/workup if not already done")
-
-            elif finding_type == "contradiction":
-                report_lines.append(f"{i}. **Documentation contradiction**")
-                report_lines.append(f"   - {signal}")
-                report_lines.append(f"   - *Action*: Clarify and resolve conflicting information")
-
-            else:
-                report_lines.append(f"{i}. {signal}")
+            formatter = _FINDING_FORMATTERS.get(finding.get("type", "unknown"), _format_default)
+            report_lines.append(formatter(i, finding))
 
+            confidence = finding.get("confidence", 0.5)
             if confidence < 0.7:
                 report_lines.append(f"   - *(Confidence: {confidence:.0%})*")
 
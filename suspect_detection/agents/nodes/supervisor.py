@@ -3,7 +3,7 @@ import logging
 from agents.state import AgentState
 from agents.models import SUPERVISOR_DECISION_SCHEMA
 from agents.gemini_client import get_gemini_client
-from config import GEMINI_FLASH_MODEL
+from config import GEMINI_FLASH_MODEL, SUPERVISOR_USE_LLM_ROUTING
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +39,30 @@ Consider:
 """
 
 
+def get_relevant_strategies(state: AgentState) -> list[str]:
+    """Return the detection strategies that have input data and haven't run yet."""
+    medications = state.get("medications", [])
+    labs = state.get("labs", [])
+    conditions = state.get("conditions", [])
+    completed = state.get("completed_strategies", [])
+
+    relevant_strategies = []
+
+    if (medications or labs) and "cross_reference" not in completed:
+        relevant_strategies.append("cross_reference")
+
+    if state.get("prior_year_conditions") and "dropoff" not in completed:
+        relevant_strategies.append("dropoff")
+
+    if state.get("symptoms") and "symptom_cluster" not in completed:
+        relevant_strategies.append("symptom_cluster")
+
+    if conditions and medications and "contradiction" not in completed:
+        relevant_strategies.append("contradiction")
+
+    return relevant_strategies
+
+
 def supervisor_node(state: AgentState) -> dict:
     medications = state.get("medications", [])
     labs = state.get("labs", [])
@@ -57,29 +81,18 @@ def supervisor_node(state: AgentState) -> dict:
         return {"next_step": "aggregate"}
 
     # Find relevant strategies
-    relevant_strategies = []
-
-    if (medications or labs) and "cross_reference" not in completed:
-        relevant_strategies.append("cross_reference")
-
-    if prior_conditions and "dropoff" not in completed:
-        relevant_strategies.append("dropoff")
-
-    if symptoms and "symptom_cluster" not in completed:
-        relevant_strategies.append("symptom_cluster")
-
-    if conditions and medications and "contradiction" not in completed:
-        relevant_strategies.append("contradiction")
+    relevant_strategies = get_relevant_strategies(state)
 
     # No relevant strategies -> aggregate
     if not relevant_strategies:
         logger.info("No relevant strategies remaining, aggregating")
         return {"next_step": "aggregate"}
 
-    # Simple case: single strategy
-    if len(relevant_strategies) == 1:
+    # Deterministic routing: relevant_strategies is already in priority order
+    # (cross_reference first), so the LLM is only consulted when enabled
+    if len(relevant_strategies) == 1 or not SUPERVISOR_USE_LLM_ROUTING:
         next_strategy = relevant_strategies[0]
-        logger.info(f"Single relevant strategy: {next_strategy}")
+        logger.info(f"Next strategy: {next_strategy}")
         return {
             "next_step": next_strategy,
             "current_strategy": next_strategy,
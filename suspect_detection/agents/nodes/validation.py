@@ -1,20 +1,34 @@
+import asyncio
+import hashlib
 import logging
+import re
+import threading
+from collections import OrderedDict
 
 from agents.state import AgentState
-from agents.models import FINDING_VALIDATION_SCHEMA
+from agents.models import BATCH_FINDING_VALIDATION_SCHEMA
 from agents.gemini_client import get_gemini_client
 from config import (
     GEMINI_FLASH_MODEL,
+    GEMINI_VALIDATOR_MODEL,
     MAX_REFINEMENT_ATTEMPTS,
     CONFIDENCE_THRESHOLD,
     REFINEMENT_THRESHOLD,
     VALIDATION_MAX_DOCS,
     VALIDATION_MAX_CHARS,
+    VALIDATION_BATCH_SIZE,
+    VALIDATION_BASE_TOKENS,
+    VALIDATION_TOKENS_PER_FINDING,
+    VALIDATION_MAX_OUTPUT_TOKENS,
+    VALIDATION_CONCURRENCY,
+    VALIDATION_LEXICAL_SHORTCUT,
+    VALIDATION_LEXICAL_MIN_TERMS,
+    VALIDATION_LEXICAL_CONFIDENCE,
 )
 
 logger = logging.getLogger(__name__)
 
-VALIDATION_PROMPT = """You are a clinical validation expert. Your job is to verify that clinical findings are supported by the source documents.
+VALIDATION_PROMPT = f"""You are a clinical validation expert. Your job is to verify that clinical findings are supported by the source documents.
 
 For each finding, evaluate:
 1. **is_supported**: Is the finding directly supported by evidence in the documents?
@@ -22,11 +36,25 @@ For each finding, evaluate:
 3. **confidence**: How confident are you in the finding? (0.0 - 1.0)
 4. **issues**: What specific problems exist with this finding?
 5. **suggested_fix**: How could the finding be corrected?
+6. **corrected_signal**: If the finding is only partly supported, the corrected signal text that addresses the issues, or "INVALID" if the documents can't support any version of it. Leave empty for findings that are fine as written.
+
+Findings with confidence below {REFINEMENT_THRESHOLD} are discarded, so leave issues, suggested_fix and corrected_signal empty for them.
 
 Be rigorous but fair. A finding can be valid even if the exact wording differs from the source.
 Focus on factual accuracy, not stylistic concerns.
 """
 
+REFINEMENT_PROMPT = "You are refining clinical findings to be more accurate. Be concise."
+
+# (finding, source documents) digest -> validation verdict, shared across turns
+_verdicts = OrderedDict()
+_verdicts_lock = threading.Lock()
+_VERDICT_CACHE_SIZE = 2048
+
+# Words of 4+ letters and numbers; the terms a lexical check compares
+_KEY_TERM_RE = re.compile(r"[a-z]{4,}|\d+(?:\.\d+)?")
+
+
 def _build_doc_summary(documents: list, max_docs: int = VALIDATION_MAX_DOCS, max_chars: int = VALIDATION_MAX_CHARS) -> str:
     """Build a text summary of documents for LLM context."""
     summary = ""
@@ -37,9 +65,96 @@ def _build_doc_summary(documents: list, max_docs: int = VALIDATION_MAX_DOCS, max
     return summary
 
 
-def self_reflect_node(state: AgentState) -> dict:
+def _get_doc_summary(state: AgentState) -> tuple[str, str, dict]:
+    """Return the document summary and its digest, building them on first use.
+
+    Returns:
+        (summary, digest, state update); the update is empty unless the
+        summary was just built, and should be merged into the node's output
+    """
+    summary = state.get("doc_summary")
+    if summary:
+        return summary, state.get("doc_summary_hash", ""), {}
+    summary = _build_doc_summary(state.get("documents", []))
+    digest = hashlib.blake2b(summary.encode("utf-8"), digest_size=16).hexdigest()
+    return summary, digest, {"doc_summary": summary, "doc_summary_hash": digest}
+
+
+def _doc_prefix(doc_summary: str) -> str:
+    # Leads every validation and refinement prompt, so repeat calls on a model
+    # hit Gemini's implicit prefix cache
+    return f"Source Documents:\n{doc_summary}\n\n"
+
+
+def _lexical_verdict(finding: dict, doc_terms: set) -> dict | None:
+    # Supported outright if every key term of the signal is in the documents
+    terms = set(_KEY_TERM_RE.findall(finding.get("signal", "").lower()))
+    if len(terms) < VALIDATION_LEXICAL_MIN_TERMS or not terms <= doc_terms:
+        return None
+    return {"is_supported": True, "has_hallucination": False, "confidence": VALIDATION_LEXICAL_CONFIDENCE}
+
+
+def _verdict_key(finding: dict, doc_hash: str) -> str:
+    # Covers exactly the finding fields the validation prompt shows the model
+    text = f"{finding.get('type')}\0{finding.get('signal')}\0{finding.get('severity')}\0{doc_hash}"
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _get_verdict(key: str) -> dict | None:
+    with _verdicts_lock:
+        verdict = _verdicts.get(key)
+        if verdict is not None:
+            _verdicts.move_to_end(key)
+        return verdict
+
+
+def _store_verdict(key: str, verdict: dict) -> None:
+    with _verdicts_lock:
+        _verdicts[key] = verdict
+        _verdicts.move_to_end(key)
+        while len(_verdicts) > _VERDICT_CACHE_SIZE:
+            _verdicts.popitem(last=False)
+
+
+async def _validate_batch(client, findings: list, doc_summary: str) -> dict[int, dict]:
+    """Validate several findings in one call.
+
+    Returns:
+        Validation results keyed by the finding's position in `findings`;
+        findings the model skipped are missing
+    """
+    listing = "\n\n".join(
+        f"[{i}] Type: {finding.get('type')}\n"
+        f"Signal: {finding.get('signal')}\n"
+        f"Severity: {finding.get('severity')}"
+        for i, finding in enumerate(findings)
+    )
+    # Documents go first so every call for this patient shares a cacheable prefix
+    results = await client.generate_structured_async(
+        prompt=f"""Findings to validate:
+{listing}
+
+Validate each finding against the source documents. Return one result per finding, with its index.""",
+        response_schema=BATCH_FINDING_VALIDATION_SCHEMA,
+        model=GEMINI_VALIDATOR_MODEL,
+        system_instruction=VALIDATION_PROMPT,
+        cached_prefix=_doc_prefix(doc_summary),
+        max_tokens=min(
+            VALIDATION_BASE_TOKENS + VALIDATION_TOKENS_PER_FINDING * len(findings),
+            VALIDATION_MAX_OUTPUT_TOKENS,
+        ),
+    )
+
+    if not isinstance(results, list):
+        return {}
+    return {
+        v["index"]: v for v in results
+        if isinstance(v, dict) and isinstance(v.get("index"), int) and 0 <= v["index"] < len(findings)
+    }
+
+
+async def self_reflect_node(state: AgentState) -> dict:
     findings = state.get("findings", [])
-    documents = state.get("documents", [])
     refinement_attempts = state.get("refinement_attempts", 0)
     already_validated = state.get("validated_findings", [])
 
@@ -68,49 +183,85 @@ def self_reflect_node(state: AgentState) -> dict:
 
     logger.info(f"Validating {len(findings_to_check)} findings (attempt {refinement_attempts + 1})")
 
-    doc_summary = _build_doc_summary(documents)
+    doc_summary, doc_hash, summary_update = _get_doc_summary(state)
     client = get_gemini_client()
     validated = list(already_validated)  # Start with already validated
     needs_refinement = []
 
-    for finding in findings_to_check:
-        try:
-            # Validate finding
-            validation = client.generate_structured(
-                prompt=f"""Finding to validate:
-Type: {finding.get('type')}
-Signal: {finding.get('signal')}
-Severity: {finding.get('severity')}
-
-Source Documents:
-{doc_summary}
-
-Validate this finding against the source documents.""",
-                response_schema=FINDING_VALIDATION_SCHEMA,
-                model=GEMINI_FLASH_MODEL,
-                system_instruction=VALIDATION_PROMPT,
-            )
-
-            is_supported = validation.get("is_supported", True)
-            has_hallucination = validation.get("has_hallucination", False)
-            confidence = validation.get("confidence", 0.5)
-            issues = validation.get("issues", [])
-
-            if is_supported and not has_hallucination and confidence >= CONFIDENCE_THRESHOLD:
-                validated.append({**finding, "confidence": confidence, "validated": True})
-            elif confidence >= REFINEMENT_THRESHOLD and refinement_attempts < MAX_REFINEMENT_ATTEMPTS:
+    # Findings already judged against these documents (e.g. on an earlier
+    # turn) reuse that verdict instead of going back to the model
+    keys = [_verdict_key(finding, doc_hash) for finding in findings_to_check]
+    verdicts = [_get_verdict(key) for key in keys]
+    if VALIDATION_LEXICAL_SHORTCUT:
+        doc_terms = set()
+        for doc in state.get("documents", []):
+            doc_terms.update(_KEY_TERM_RE.findall(doc.get("content", "").lower()))
+        verdicts = [
+            verdict if verdict is not None else _lexical_verdict(finding, doc_terms)
+            for finding, verdict in zip(findings_to_check, verdicts)
+        ]
+    unjudged = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if len(unjudged) < len(findings_to_check):
+        logger.info(f"Judged {len(findings_to_check) - len(unjudged)} findings without a Gemini call")
+
+    batches = [
+        unjudged[start:start + VALIDATION_BATCH_SIZE]
+        for start in range(0, len(unjudged), VALIDATION_BATCH_SIZE)
+    ]
+    semaphore = asyncio.Semaphore(VALIDATION_CONCURRENCY)
+
+    async def validate(batch: list) -> dict[int, dict]:
+        # Errors stay per batch so one failure doesn't cancel the rest
+        async with semaphore:
+            try:
+                return await _validate_batch(client, [findings_to_check[i] for i in batch], doc_summary)
+            except Exception as e:
+                logger.warning(f"Validation failed for {len(batch)} findings: {e}")
+                return {}
+
+    all_validations = await asyncio.gather(*(validate(batch) for batch in batches))
+
+    for batch, validations in zip(batches, all_validations):
+        for pos, i in enumerate(batch):
+            verdict = validations.get(pos)
+            if verdict is not None:
+                verdicts[i] = verdict
+                _store_verdict(keys[i], verdict)
+
+    for finding, validation in zip(findings_to_check, verdicts):
+        if validation is None:
+            # Unvalidated findings are kept, flagged as such
+            validated.append({**finding, "confidence": 0.5, "validated": False})
+            continue
+
+        is_supported = validation.get("is_supported", True)
+        has_hallucination = validation.get("has_hallucination", False)
+        confidence = validation.get("confidence", 0.5)
+        issues = validation.get("issues", [])
+
+        if is_supported and not has_hallucination and confidence >= CONFIDENCE_THRESHOLD:
+            validated.append({**finding, "confidence": confidence, "validated": True})
+        elif confidence >= REFINEMENT_THRESHOLD and refinement_attempts < MAX_REFINEMENT_ATTEMPTS:
+            # The validator usually corrects borderline findings itself; refine_node
+            # only handles the ones it left uncorrected
+            corrected = (validation.get("corrected_signal") or "").strip()
+            if corrected.upper() == "INVALID":
+                logger.info(f"Finding marked invalid: {finding.get('signal', '')[:50]}")
+            elif corrected:
+                if corrected not in validated_signals:
+                    validated_signals.add(corrected)
+                    # The rewrite itself was never checked, and the verdict's
+                    # confidence is for the original claim, so neither carries over
+                    validated.append({**finding, "signal": corrected, "refined": True, "validated": False})
+            else:
                 needs_refinement.append({
                     **finding,
                     "validation_issues": issues,
                     "suggested_fix": validation.get("suggested_fix"),
                 })
-            else:
-                # Low confidence
-                logger.info(f"Dropping finding (low confidence {confidence}): {finding.get('signal', '')[:50]}")
-
-        except Exception as e:
-            logger.warning(f"Validation failed for finding: {e}")
-            validated.append({**finding, "confidence": 0.5, "validated": False})
+        else:
+            # Low confidence
+            logger.info(f"Dropping finding (low confidence {confidence}): {finding.get('signal', '')[:50]}")
 
     new_validated = len(validated) - len(already_validated)
     logger.info(f"Validation: {new_validated} newly validated, {len(needs_refinement)} need refinement (total: {len(validated)})")
@@ -121,6 +272,7 @@ Validate this finding against the source documents.""",
             "findings_to_refine": needs_refinement,
             "refinement_attempts": refinement_attempts + 1,
             "next_step": "refine",
+            **summary_update,
         }
 
     # Done
@@ -128,65 +280,74 @@ Validate this finding against the source documents.""",
         "validated_findings": validated + needs_refinement,  # Include remaining as-is
         "findings_to_refine": [],
         "next_step": "report",
+        **summary_update,
     }
 
 
-def refine_node(state: AgentState) -> dict:
-    findings_to_refine = state.get("findings_to_refine", [])
-    documents = state.get("documents", [])
-
-    if not findings_to_refine:
-        return {"next_step": "self_reflect"}
-
-    logger.info(f"Refining {len(findings_to_refine)} findings")
+async def _refine_one(client, finding: dict, doc_summary: str) -> dict | None:
+    """Return the corrected finding, the original on error, or None if invalid."""
+    issues = finding.get("validation_issues", [])
+    suggested_fix = finding.get("suggested_fix", "")
 
-    doc_summary = _build_doc_summary(documents)
-    client = get_gemini_client()
-    refined_findings = []
-
-    for finding in findings_to_refine:
-        issues = finding.get("validation_issues", [])
-        suggested_fix = finding.get("suggested_fix", "")
-
-        try:
-            # Refine finding
-            refined_text = client.generate(
-                prompt=f"""Original finding:
+    try:
+        # Refine finding
+        refined_text = await client.generate_async(
+            prompt=f"""Original finding:
 Type: {finding.get('type')}
 Signal: {finding.get('signal')}
 
 Issues found: {', '.join(issues)}
 Suggested fix: {suggested_fix}
 
-Source documents:
-{doc_summary}
-
 Please provide a corrected version of this finding that addresses the issues.
 If the finding cannot be corrected (no evidence), respond with "INVALID".
 
 Respond with just the corrected signal text, nothing else.""",
-                model=GEMINI_FLASH_MODEL,
-                system_instruction="You are refining clinical findings to be more accurate. Be concise.",
-            )
+            model=GEMINI_FLASH_MODEL,
+            system_instruction=REFINEMENT_PROMPT,
+            # Low temperature so re-analyses can replay cached refinements
+            temperature=0.1,
+            cached_prefix=_doc_prefix(doc_summary),
+        )
+
+        refined_text = refined_text.strip()
+
+        if refined_text.upper() == "INVALID" or not refined_text:
+            logger.info(f"Finding marked invalid: {finding.get('signal', '')[:50]}")
+            return None
+
+        refined_finding = {
+            k: v for k, v in finding.items()
+            if k not in ("validation_issues", "suggested_fix")
+        }
+        refined_finding["signal"] = refined_text
+        refined_finding["refined"] = True
+        return refined_finding
 
-            refined_text = refined_text.strip()
+    except Exception as e:
+        logger.warning(f"Refinement failed: {e}")
+        # Keep original
+        return finding
 
-            if refined_text.upper() == "INVALID" or not refined_text:
-                logger.info(f"Finding marked invalid: {finding.get('signal', '')[:50]}")
-                continue
 
-            refined_finding = {
-                k: v for k, v in finding.items()
-                if k not in ("validation_issues", "suggested_fix")
-            }
-            refined_finding["signal"] = refined_text
-            refined_finding["refined"] = True
-            refined_findings.append(refined_finding)
+async def refine_node(state: AgentState) -> dict:
+    findings_to_refine = state.get("findings_to_refine", [])
+
+    if not findings_to_refine:
+        return {"next_step": "self_reflect"}
+
+    logger.info(f"Refining {len(findings_to_refine)} findings")
+
+    doc_summary, _, summary_update = _get_doc_summary(state)
+    client = get_gemini_client()
+    semaphore = asyncio.Semaphore(VALIDATION_CONCURRENCY)
+
+    async def refine(finding: dict) -> dict | None:
+        async with semaphore:
+            return await _refine_one(client, finding, doc_summary)
 
-        except Exception as e:
-            logger.warning(f"Refinement failed: {e}")
-            # Keep original
-            refined_findings.append(finding)
+    results = await asyncio.gather(*(refine(finding) for finding in findings_to_refine))
+    refined_findings = [finding for finding in results if finding is not None]
 
     logger.info(f"Refined {len(refined_findings)} findings")
 
@@ -195,4 +356,5 @@ Respond with just the corrected signal text, nothing else.""",
     return {
         "validated_findings": existing_validated + refined_findings,
         "findings_to_refine": [],
+        **summary_update,
     }
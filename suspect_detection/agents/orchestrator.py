@@ -1,7 +1,11 @@
 import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
 
-from agents.graph import create_graph, run_analysis_sync, run_analysis
+from agents.graph import get_default_graph, run_analysis_sync, run_analysis
+from config import MAX_SESSIONS, SESSION_TTL
 
 logger = logging.getLogger(__name__)
 
@@ -12,14 +16,15 @@ class Orchestrator:
     for common state fields.
     """
 
-    def __init__(self, session_id: str = None):
+    def __init__(self, session_id: str = None, graph=None):
         """Initialize the orchestrator.
 
         Args:
             session_id: Unique session ID for checkpointing
+            graph: Optional compiled graph (defaults to the shared graph)
         """
         self.session_id = session_id or str(uuid.uuid4())
-        self.graph = create_graph()
+        self.graph = graph if graph is not None else get_default_graph()
         self._graph_state: dict = {}
 
         logger.info(f"Orchestrator initialized with session {self.session_id}")
@@ -122,26 +127,70 @@ class Orchestrator:
         return self._graph_state
 
 
-# Session management
-_orchestrators: dict[str, Orchestrator] = {}
+# Session management: session_id -> (last_used, Orchestrator), in LRU order
+_orchestrators: OrderedDict[str, tuple[float, Orchestrator]] = OrderedDict()
+_orchestrators_lock = threading.Lock()
+_session_hits = 0
+_session_misses = 0
+
+
+def _evict(orchestrator: Orchestrator) -> None:
+    # Drop the state now in case a request still holds a reference
+    orchestrator._graph_state = {}
+    logger.debug(f"Evicted session {orchestrator.session_id}")
 
 
 def get_orchestrator(session_id: str = None) -> Orchestrator:
     """Get or create an orchestrator for a session.
 
+    Sessions idle for longer than SESSION_TTL are dropped, as is the least
+    recently used one once there are more than MAX_SESSIONS.
+
     Args:
         session_id: Optional session ID. If None, creates a new one.
 
     Returns:
         Orchestrator instance
     """
+    global _session_hits, _session_misses
     if session_id is None:
         session_id = str(uuid.uuid4())
 
-    if session_id not in _orchestrators:
-        _orchestrators[session_id] = Orchestrator(session_id=session_id)
-
-    return _orchestrators[session_id]
+    with _orchestrators_lock:
+        entry = _orchestrators.get(session_id)
+    if entry is not None and time.monotonic() - entry[0] <= SESSION_TTL:
+        orchestrator = entry[1]
+    else:
+        # Built outside the lock; the first one compiles the shared graph
+        orchestrator = Orchestrator(session_id=session_id)
+
+    now = time.monotonic()
+    evicted = []
+    with _orchestrators_lock:
+        current = _orchestrators.get(session_id)
+        if current is not None and current[1] is not orchestrator and now - current[0] <= SESSION_TTL:
+            # Another request created or refreshed this session first
+            orchestrator = current[1]
+        if current is not None and current[1] is orchestrator:
+            _session_hits += 1
+        else:
+            _session_misses += 1
+            if current is not None:
+                evicted.append(current[1])
+        _orchestrators[session_id] = (now, orchestrator)
+        _orchestrators.move_to_end(session_id)
+
+        # Oldest entries sit at the front, so expired ones are found first
+        while _orchestrators:
+            oldest_id, (last_used, oldest) = next(iter(_orchestrators.items()))
+            if len(_orchestrators) <= MAX_SESSIONS and now - last_used <= SESSION_TTL:
+                break
+            del _orchestrators[oldest_id]
+            evicted.append(oldest)
+
+    for old in evicted:
+        _evict(old)
+    return orchestrator
 
 
 def reset_orchestrator(session_id: str = None):
@@ -150,10 +199,24 @@ def reset_orchestrator(session_id: str = None):
     Args:
         session_id: Session to reset. If None, resets all.
     """
-    if session_id is None:
-        _orchestrators.clear()
-    elif session_id in _orchestrators:
-        del _orchestrators[session_id]
+    with _orchestrators_lock:
+        if session_id is None:
+            _orchestrators.clear()
+        else:
+            _orchestrators.pop(session_id, None)
+
+
+def get_session_stats() -> dict:
+    """Size and hit rate of the session registry."""
+    with _orchestrators_lock:
+        lookups = _session_hits + _session_misses
+        return {
+            "sessions": len(_orchestrators),
+            "max_sessions": MAX_SESSIONS,
+            "hits": _session_hits,
+            "misses": _session_misses,
+            "hit_rate": _session_hits / lookups if lookups else 0.0,
+        }
 
 
 if __name__ == "__main__":
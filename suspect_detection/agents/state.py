@@ -2,6 +2,9 @@ from typing import TypedDict, Annotated, Literal, Union, Optional
 import operator
 
 
+_SEVERITY_RANK = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+
 def merge_findings(existing: list, new: Union[list, dict]) -> list:
     """Custom reducer to merge findings, handling both list and single dict inputs."""
     if isinstance(new, dict):
@@ -12,17 +15,14 @@ def merge_findings(existing: list, new: Union[list, dict]) -> list:
     # Use signal as dedup key
     seen = {f.get("signal", str(i)): f for i, f in enumerate(existing)}
 
-    severity_rank = {"critical": 0, "high": 1, "medium": 2, "low": 3}
-
     for finding in new:
         key = finding.get("signal", "")
-        if key in seen:
-            # Keep higher severity version
-            if severity_rank.get(finding.get("severity", "low"), 4) < severity_rank.get(
-                seen[key].get("severity", "low"), 4
-            ):
-                seen[key] = finding
-        else:
+        current = seen.setdefault(key, finding)
+        if current is finding:
+            continue
+        # Keep higher severity version
+        rank = _SEVERITY_RANK.get(finding.get("severity", "low"), 4)
+        if rank < _SEVERITY_RANK.get(current.get("severity", "low"), 4):
             seen[key] = finding
 
     return list(seen.values())
@@ -36,6 +36,7 @@ class AgentState(TypedDict, total=False):
 
     # Patient context
     patient_id: Optional[str]
+    patient_ids: list  # Multi-patient analysis requests
 
     # Documents
     documents: list
@@ -55,6 +56,8 @@ class AgentState(TypedDict, total=False):
     validated_findings: list
     findings_to_refine: list
     refinement_attempts: int
+    doc_summary: str  # Source text shown to the validator, built once per analysis
+    doc_summary_hash: str
 
     # Control flow
     next_step: str
@@ -67,6 +70,7 @@ class AgentState(TypedDict, total=False):
 
     # Output
     response: str
+    response_type: Optional[str]  # Which canned reply general_response should give
 
 
 def create_initial_state(user_message: str) -> AgentState:
@@ -85,10 +89,14 @@ def create_initial_state(user_message: str) -> AgentState:
         validated_findings=[],
         findings_to_refine=[],
         refinement_attempts=0,
+        doc_summary="",
+        doc_summary_hash="",
         next_step="",
         current_strategy=None,
         info_request=False,
         original_query=None,
         error=None,
         response="",
+        response_type=None,
+        patient_ids=[],
     )
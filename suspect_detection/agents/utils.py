@@ -1,4 +1,48 @@
+import threading
+from collections import OrderedDict
+
+# State keys the context is rendered from (findings are handled separately)
+_CONTEXT_SOURCE_KEYS = (
+    "medications", "labs", "conditions", "prior_year_conditions", "symptoms",
+)
+
+# (patient_id, source ids) -> (source objects, rendered context)
+_context_memo = OrderedDict()
+_context_memo_lock = threading.Lock()
+_CONTEXT_MEMO_SIZE = 32
+
+_ABNORMAL_FLAGS = frozenset({"high", "low", "abnormal"})
+
+
 def build_patient_context(state: dict) -> str:
+    """Render the patient's extracted data as markdown for LLM prompts.
+
+    Follow-up turns carry the same extracted lists forward, so the rendered
+    text is memoized on the identity of those lists. Nodes always return new
+    lists rather than mutating state in place, so a changed field misses.
+    """
+    # Only the findings list that gets rendered counts; the raw findings
+    # reducer hands back a fresh list every turn
+    findings = state.get("validated_findings") or state.get("findings")
+    sources = tuple(state.get(key) for key in _CONTEXT_SOURCE_KEYS) + (findings,)
+    memo_key = (state.get("patient_id", "Unknown"), tuple(map(id, sources)))
+    with _context_memo_lock:
+        entry = _context_memo.get(memo_key)
+        if entry is not None and all(a is b for a, b in zip(entry[0], sources)):
+            _context_memo.move_to_end(memo_key)
+            return entry[1]
+
+    context = _render_patient_context(state)
+
+    with _context_memo_lock:
+        # Holding the source objects keeps their ids from being reused
+        _context_memo[memo_key] = (sources, context)
+        while len(_context_memo) > _CONTEXT_MEMO_SIZE:
+            _context_memo.popitem(last=False)
+    return context
+
+
+def _render_patient_context(state: dict) -> str:
     patient_id = state.get("patient_id", "Unknown")
     meds = state.get("medications", [])
     labs = state.get("labs", [])
@@ -29,8 +73,10 @@ def build_patient_context(state: dict) -> str:
 
     if labs:
         # Show abnormal labs first, then some normal ones
-        abnormal_labs = [l for l in labs if l.get('flag', '').lower() in ('high', 'low', 'abnormal')]
-        normal_labs = [l for l in labs if l not in abnormal_labs]
+        abnormal_labs, normal_labs = [], []
+        for l in labs:
+            is_abnormal = (l.get('flag') or '').lower() in _ABNORMAL_FLAGS
+            (abnormal_labs if is_abnormal else normal_labs).append(l)
 
         lab_lines = []
         for l in abnormal_labs[:10]:
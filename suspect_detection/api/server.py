@@ -14,8 +14,9 @@ from pydantic import BaseModel
 # Add parent to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.orchestrator import Orchestrator, get_orchestrator
-from agents.graph import create_graph
+from agents.orchestrator import Orchestrator, get_orchestrator, get_session_stats
+from agents.graph import get_default_graph
+from agents.gemini_client import aclose_gemini_client, get_response_cache_stats
 from retrieval.loader import DocumentLoader
 from config import PATIENT_DATA_PATH, LOG_LEVEL, LOG_DIR, LOG_FILE
 
@@ -55,6 +56,8 @@ class PatientInfo(BaseModel):
 
 # Pre-compile graph on startup for faster first requests
 _shared_graph = None
+# Shared so parsed documents are reused across requests
+_loader = DocumentLoader(PATIENT_DATA_PATH)
 
 
 @asynccontextmanager
@@ -64,13 +67,14 @@ async def lifespan(_app: FastAPI):
 
     logger.info("Starting Suspect Detection API...")
 
-    # Initialize shared graph
-    _shared_graph = create_graph()
+    # Compile the graph every session shares before the first request
+    _shared_graph = get_default_graph()
     logger.info("LangGraph initialized")
 
     yield
 
     logger.info("Shutting down Suspect Detection API...")
+    await aclose_gemini_client()
 
 
 app = FastAPI(
@@ -113,9 +117,16 @@ async def health_check():
         "status": "healthy",
         "graph_ready": _shared_graph is not None,
         "version": "2.0.0",
+        "sessions": get_session_stats(),
     }
 
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Gemini response cache statistics."""
+    return get_response_cache_stats()
+
+
 @app.post("/api/chat")
 async def chat(request: ChatRequest) -> ChatResponse:
     """Process a chat message.
@@ -150,13 +161,12 @@ async def chat(request: ChatRequest) -> ChatResponse:
 async def list_patients() -> list[PatientInfo]:
     """List all available patients with document counts."""
     try:
-        loader = DocumentLoader(PATIENT_DATA_PATH)
-        patient_ids = loader.list_patients()
+        patient_ids = _loader.list_patients()
 
         return [
             PatientInfo(
                 patient_id=pid,
-                document_count=len(loader.load_patient_documents(pid)),
+                document_count=len(_loader.load_patient_documents(pid)),
             )
             for pid in patient_ids
         ]
@@ -170,8 +180,7 @@ async def list_patients() -> list[PatientInfo]:
 async def get_patient_documents(patient_id: str):
     """Get documents for a specific patient."""
     try:
-        loader = DocumentLoader(PATIENT_DATA_PATH)
-        docs = loader.load_patient_documents(patient_id)
+        docs = _loader.load_patient_documents(patient_id)
 
         if not docs:
             raise HTTPException(status_code=404, detail=f"No documents found for patient {patient_id}")
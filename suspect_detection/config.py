@@ -15,14 +15,60 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Model settings
 GEMINI_FLASH_MODEL = "gemini-2.0-flash"      # Fast tasks: routing, simple queries
 GEMINI_PRO_MODEL = "gemini-2.5-pro"        # Complex reasoning (using flash to avoid rate limits)
+# First-pass finding validation is a structured classification, so a lighter tier suffices
+GEMINI_VALIDATOR_MODEL = os.getenv("GEMINI_VALIDATOR_MODEL", "gemini-2.0-flash-lite")
+
+# Pooled connections shared by all concurrent Gemini calls
+GEMINI_MAX_CONNECTIONS = 64
 
 # Embedding model (local sentence-transformers)
 EMBEDDING_MODEL = "NeuML/pubmedbert-base-embeddings"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # 64+ suits a GPU
+# Optional directory persisting query embeddings across runs (unset = memory only)
+EMBEDDING_CACHE_DIR = os.getenv("SUSPECT_EMB_CACHE_DIR") or None
 
 # LLM generation settings
 DEFAULT_TEMPERATURE = 0.3
 DEFAULT_MAX_TOKENS = 4096
 
+# Response cache (exact-match, only for near-deterministic calls)
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 3600  # seconds
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.1
+
+# Provider-side context cache for static system prompts
+CONTEXT_CACHE_TTL = 3600  # seconds
+# Smallest cache, in tokens, each model accepts. Models not listed (e.g. the
+# flash-lite validator) are never cached explicitly and rely on implicit caching.
+CONTEXT_CACHE_MIN_TOKENS = {
+    GEMINI_FLASH_MODEL: 4096,
+    GEMINI_PRO_MODEL: 4096,
+}
+# Patient data reused across follow-up questions in a session
+PATIENT_CONTEXT_CACHE_TTL = 600  # seconds
+
+# Structured outputs larger than this are parsed off the event loop
+STRUCTURED_PARSE_OFFLOAD_CHARS = 32_768
+
+# Micro-batching of concurrent intent classifications. Off by default: it puts
+# messages from unrelated sessions into one prompt
+INTENT_BATCHING = os.getenv("INTENT_BATCHING", "false").lower() in ("1", "true", "yes")
+INTENT_BATCH_MAX = 16
+INTENT_BATCH_WAIT = 0.02  # seconds to wait for more requests after the first
+
+# Sequential graph: ask Gemini to order strategies instead of the fixed priority
+SUPERVISOR_USE_LLM_ROUTING = os.getenv("SUPERVISOR_USE_LLM_ROUTING", "false").lower() in ("1", "true", "yes")
+
+# Most patients a single "Analyze A, B, C" message may fan out to
+MAX_BATCH_PATIENTS = 5
+
+# Checkpointing (threads kept in memory before the oldest is evicted)
+MAX_CHECKPOINT_THREADS = 256
+
+# Chat sessions kept in memory; idle or least recently used ones are dropped
+MAX_SESSIONS = 1024
+SESSION_TTL = 3600  # seconds
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_DIR = os.path.join(BASE_DIR, "logs")
@@ -34,6 +80,19 @@ CONFIDENCE_THRESHOLD = 0.6
 REFINEMENT_THRESHOLD = 0.3
 VALIDATION_MAX_DOCS = 5
 VALIDATION_MAX_CHARS = 2000
+VALIDATION_BATCH_SIZE = 10  # Findings validated per Gemini call
+# Output budget per batched validation call: a base plus room for each finding's
+# free-text fields, capped at the validator model's output limit
+VALIDATION_BASE_TOKENS = 256
+VALIDATION_TOKENS_PER_FINDING = 512
+VALIDATION_MAX_OUTPUT_TOKENS = 8192
+VALIDATION_CONCURRENCY = 8  # In-flight Gemini calls in validation/refinement
+# Accept findings whose every key term appears verbatim in the documents without
+# asking Gemini. Off by default: a claim about a *missing* diagnosis can reuse
+# only words the chart contains.
+VALIDATION_LEXICAL_SHORTCUT = os.getenv("VALIDATION_LEXICAL_SHORTCUT", "false").lower() in ("1", "true", "yes")
+VALIDATION_LEXICAL_MIN_TERMS = 3
+VALIDATION_LEXICAL_CONFIDENCE = 0.75
 
 # Chunking
 MIN_CHUNK_SIZE = 100
@@ -45,6 +104,22 @@ SMALL_SECTION_THRESHOLD = 200
 MIN_SPLIT_SIZE = 50
 HEADER_MAX_LINES = 10
 
+# Vector index: exact flat search until the corpus reaches the threshold,
+# then an HNSW graph (no training step, so chunks can still be added one batch at a time)
+VECTOR_HNSW_THRESHOLD = 50000
+VECTOR_HNSW_M = 32
+VECTOR_HNSW_EF_SEARCH = 64
+# Store HNSW vectors as 8-bit scalars (4x less memory, ~1-2% recall loss),
+# trained on the vectors already in the flat index when it converts
+VECTOR_HNSW_SQ8 = True
+# FAISS OpenMP threads; a small team keeps per-query thread startup cheap
+FAISS_OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", str(min(4, os.cpu_count() or 1))))
+# Save flat-index vectors as float16 (half the size on disk), widened on load
+VECTOR_DISK_FP16 = True
+
+# Patient roster cache (seconds)
+PATIENT_CACHE_TTL = 30
+
 # Document retrieval
 CHUNKS_PER_QUERY = 5
 MAX_TOTAL_CHUNKS = 20
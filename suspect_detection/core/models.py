@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     content: str
     patient_id: str
@@ -11,7 +11,7 @@ class Document:
     source_file: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Chunk:
     id: str
     content: str
@@ -1,5 +1,7 @@
 import re
+import functools
 import hashlib
+from collections import OrderedDict
 from typing import Optional
 from core.models import Document, Chunk
 from config import (
@@ -15,12 +17,66 @@ from config import (
 
 SECTION_DELIMITER = "=" * 80
 
+# Lines that end a document's header
+_HEADER_END_KEYWORDS = ("Subjective:", "Chief Complaint:", "CLINICAL INDICATION")
+
+# Subword tokenizers emit at most one token per UTF-8 byte, plus a few
+# special/prefix tokens; text shorter than the budget by this much always fits
+_TOKEN_BOUND_SLACK = 4
+
+# Token counts remembered per Chunker; headers and common words repeat a lot
+_TOKEN_CACHE_SIZE = 4096
+
+# Sentence end plus the whitespace after it; cheaper to scan for than a lookbehind
+_SENTENCE_END_RE = re.compile(r"[.!?]\s+")
+_PARA_SPLIT_RE = re.compile(r"\n\s*\n")
+_SECTION_HEADER_RE = re.compile(
+    r"={60,}\n"          # Opening delimiter (60+ equals)
+    r"([A-Z][A-Z0-9\s\-_/]*(?:\s*\([^)]*\))?)\n"  # Section name with optional parenthetical
+    r"={60,}\n"          # Closing delimiter
+)
+_TRAILING_DELIM_RE = re.compile(r"\n={60,}\s*$")
+_MARKER_RE = re.compile(r"^\[[A-Z][A-Z\s\-_/]+\]")
+_PAREN_TAIL_RE = re.compile(r"\s*\([^)]*\)\s*$")
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+# Every SOAP label, found in one pass over the note
+_SOAP_BOUNDARY_RE = re.compile(
+    r"Chief Complaint:|Subjective:|Objective:|Assessment/Plan:|Assessment:|Electronically signed",
+    re.IGNORECASE,
+)
+# Section name, labels that open it, labels that close it (else it runs to the end)
+_SOAP_SECTIONS = [
+    ("chief_complaint", {"chief complaint:"}, {"subjective:"}),
+    ("subjective", {"subjective:"}, {"objective:"}),
+    ("objective", {"objective:"}, {"assessment/plan:", "assessment:"}),
+    ("assessment_plan", {"assessment/plan:", "assessment:"}, {"electronically signed"}),
+]
+
 
 def _with_header(content: str, header: str) -> str:
     """Prepend header to content if header exists."""
     return f"{header}\n\n{content}" if header else content
 
 
+def _split_sentences(text: str) -> list[str]:
+    # Same pieces as re.split(r"(?<=[.!?])\s+", text)
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        sentences.append(text[start:match.start() + 1])
+        start = match.end()
+    sentences.append(text[start:])
+    return sentences
+
+
+@functools.lru_cache(maxsize=2)
+def _load_tokenizer(name: str):
+    # Shared by every Chunker using the same model; loading takes hundreds of ms
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+
 class Chunker:
     def __init__(
         self,
@@ -36,16 +92,40 @@ class Chunker:
         self.max_tokens = max_tokens
         self.embedding_model = embedding_model
         self._tokenizer = None  # Lazy loaded
+        self._token_counts = OrderedDict()  # text -> token count, LRU
 
     def _get_tokenizer(self):
         if self._tokenizer is None:
-            from transformers import AutoTokenizer
-            self._tokenizer = AutoTokenizer.from_pretrained(self.embedding_model)
+            self._tokenizer = _load_tokenizer(self.embedding_model)
         return self._tokenizer
 
+    def _remember_tokens(self, text: str, count: int) -> None:
+        self._token_counts[text] = count
+        if len(self._token_counts) > _TOKEN_CACHE_SIZE:
+            self._token_counts.popitem(last=False)
+
     def _count_tokens(self, text: str) -> int:
+        count = self._token_counts.get(text)
+        if count is not None:
+            self._token_counts.move_to_end(text)
+            return count
         tokenizer = self._get_tokenizer()
-        return len(tokenizer.encode(text, add_special_tokens=True))
+        count = len(tokenizer.encode(text, add_special_tokens=True))
+        self._remember_tokens(text, count)
+        return count
+
+    def _count_tokens_batch(self, texts: list[str]) -> list[int]:
+        # One tokenizer call for the uncached texts; same counts as _count_tokens on each
+        counts = [self._token_counts.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, count in zip(texts, counts) if count is None))
+        if missing:
+            tokenizer = self._get_tokenizer()
+            encoded = tokenizer(missing, add_special_tokens=True)["input_ids"]
+            for text, ids in zip(missing, encoded):
+                self._remember_tokens(text, len(ids))
+            fresh = dict(zip(missing, map(len, encoded)))
+            counts = [fresh[text] if count is None else count for text, count in zip(texts, counts)]
+        return counts
 
     def _split_oversized_chunk(
         self,
@@ -53,7 +133,10 @@ class Chunker:
         header: str,
         section_name: str
     ) -> list[tuple[str, str]]:
-        # Check if split needed
+        # Check if split needed; short content can't exceed the budget
+        size = len(content) if content.isascii() else len(content.encode("utf-8"))
+        if size + _TOKEN_BOUND_SLACK <= self.max_tokens:
+            return [(section_name, content)]
         token_count = self._count_tokens(content)
         if token_count <= self.max_tokens:
             return [(section_name, content)]
@@ -73,23 +156,20 @@ class Chunker:
             # Header too large
             return [(section_name, content)]
 
-        # Split by sentences
-        sentences = re.split(r'(?<=[.!?])\s+', section_body)
+        # Split by sentences, tokenized in one batch
+        sentences = [sent.strip() for sent in _split_sentences(section_body)]
+        sentences = [sent for sent in sentences if sent]
         if not sentences:
             return [(section_name, content)]
+        sentence_tokens = self._count_tokens_batch(sentences)
 
         chunks = []
         current_sentences = []
+        current_lens = []  # Token count of each entry in current_sentences
         current_tokens = 0
         part_num = 1
 
-        for sent in sentences:
-            sent = sent.strip()
-            if not sent:
-                continue
-
-            sent_tokens = self._count_tokens(sent)
-
+        for sent, sent_tokens in zip(sentences, sentence_tokens):
             # Long sentence
             if sent_tokens > available_tokens:
                 # Save current chunk
@@ -100,14 +180,14 @@ class Chunker:
                         chunks.append((f"{section_name}_part{part_num}", chunk_content))
                         part_num += 1
                     current_sentences = []
+                    current_lens = []
                     current_tokens = 0
 
                 # Split by words
                 words = sent.split()
                 word_chunk = []
                 word_tokens = 0
-                for word in words:
-                    wt = self._count_tokens(word)
+                for word, wt in zip(words, self._count_tokens_batch(words)):
                     if word_tokens + wt > available_tokens and word_chunk:
                         chunk_body = " ".join(word_chunk)
                         chunk_content = _with_header(chunk_body, header)
@@ -121,7 +201,8 @@ class Chunker:
                         word_tokens += wt
                 if word_chunk:
                     current_sentences = [" ".join(word_chunk)]
-                    current_tokens = self._count_tokens(current_sentences[0])
+                    current_lens = [word_tokens]
+                    current_tokens = word_tokens
                 continue
 
             # Check limit
@@ -133,11 +214,15 @@ class Chunker:
                     part_num += 1
 
                 # Start new chunk with overlap (last 1-2 sentences)
+                # Counts are summed per sentence, as when appending below,
+                # so the overlap needs no re-tokenization
                 overlap_sents = current_sentences[-2:] if len(current_sentences) > 1 else current_sentences[-1:]
                 current_sentences = overlap_sents + [sent]
-                current_tokens = self._count_tokens(" ".join(current_sentences))
+                current_lens = current_lens[-len(overlap_sents):] + [sent_tokens]
+                current_tokens = sum(current_lens)
             else:
                 current_sentences.append(sent)
+                current_lens.append(sent_tokens)
                 current_tokens += sent_tokens
 
         # Last chunk
@@ -194,27 +279,24 @@ class Chunker:
         return Chunk(id=chunk_id, content=content.strip(), metadata=metadata)
 
     def _extract_header(self, content: str) -> tuple[str, str]:
-        lines = content.split("\n")
-        header_lines = []
-        body_start = 0
-
-        for i, line in enumerate(lines):
-            # Header ends at delimiter or SOAP keyword
-            if SECTION_DELIMITER in line or any(
-                kw in line for kw in ["Subjective:", "Chief Complaint:", "CLINICAL INDICATION"]
+        # Walk line starts without splitting the whole document
+        pos = 0
+        line_no = 0
+        while True:
+            nl = content.find("\n", pos)
+            line = content[pos:] if nl == -1 else content[pos:nl]
+            # Header ends at delimiter, SOAP keyword or the line limit
+            if (
+                SECTION_DELIMITER in line
+                or any(kw in line for kw in _HEADER_END_KEYWORDS)
+                or line_no >= HEADER_MAX_LINES
             ):
-                body_start = i
-                break
-            # Collect header lines
-            if i < HEADER_MAX_LINES:
-                header_lines.append(line)
-            else:
-                body_start = i
-                break
-
-        header = "\n".join(header_lines).strip()
-        body = "\n".join(lines[body_start:]).strip()
-        return header, body
+                return content[:pos].strip(), content[pos:].strip()
+            if nl == -1:
+                # No end found: the whole document is both header and body
+                return content.strip(), content.strip()
+            pos = nl + 1
+            line_no += 1
 
     def _chunk_by_soap_sections(self, doc: Document) -> list[Chunk]:
         content = doc.content
@@ -222,22 +304,21 @@ class Chunker:
         # Extract header for context
         header, body = self._extract_header(content)
 
-        # SOAP section patterns
-        soap_patterns = [
-            (r"Chief Complaint:.*?(?=Subjective:|$)", "chief_complaint"),
-            (r"Subjective:.*?(?=Objective:|$)", "subjective"),
-            (r"Objective:.*?(?=Assessment/Plan:|Assessment:|$)", "objective"),
-            (r"(?:Assessment/Plan:|Assessment:).*?(?=Electronically signed|$)", "assessment_plan"),
+        # Extract sections: each runs from the first label that opens it to
+        # the next label that closes it
+        boundaries = [
+            (match.start(), match.end(), match.group(0).lower())
+            for match in _SOAP_BOUNDARY_RE.finditer(body)
         ]
-
-        # Extract sections
         raw_sections = []
-        for pattern, section_name in soap_patterns:
-            match = re.search(pattern, body, re.DOTALL | re.IGNORECASE)
-            if match:
-                section_content = match.group(0).strip()
-                if section_content:
-                    raw_sections.append((section_name, section_content))
+        for section_name, openers, closers in _SOAP_SECTIONS:
+            opening = next((b for b in boundaries if b[2] in openers), None)
+            if opening is None:
+                continue
+            end = next((b[0] for b in boundaries if b[0] >= opening[1] and b[2] in closers), len(body))
+            section_content = body[opening[0]:end].strip()
+            if section_content:
+                raw_sections.append((section_name, section_content))
 
         # Merge small sections
         merged_sections = []
@@ -307,11 +388,11 @@ class Chunker:
 
         for section_name, section_content in sections:
             # Normalize section name
-            clean_section_name = re.sub(r"\s*\([^)]*\)\s*$", "", section_name).strip()
-            normalized_name = re.sub(r"[^a-z0-9]+", "_", clean_section_name.lower()).strip("_")
+            clean_section_name = _PAREN_TAIL_RE.sub("", section_name).strip()
+            normalized_name = _NORMALIZE_RE.sub("_", clean_section_name.lower()).strip("_")
 
             # Check for section markers
-            has_markers = bool(re.match(r"^\[[A-Z][A-Z\s\-_/]+\]", section_content))
+            has_markers = bool(_MARKER_RE.match(section_content))
             if has_markers:
                 chunk_content = _with_header(section_content, header)
             else:
@@ -335,15 +416,8 @@ class Chunker:
         return self._chunk_by_sections(doc)
 
     def _split_by_section_headers(self, content: str) -> list[tuple[str, str]]:
-        # Section header pattern
-        pattern = (
-            r"={60,}\n"          # Opening delimiter (60+ equals)
-            r"([A-Z][A-Z0-9\s\-_/]*(?:\s*\([^)]*\))?)\n"  # Section name with optional parenthetical
-            r"={60,}\n"          # Closing delimiter
-        )
-
         raw_sections = []
-        matches = list(re.finditer(pattern, content))
+        matches = list(_SECTION_HEADER_RE.finditer(content))
 
         for i, match in enumerate(matches):
             section_name = match.group(1).strip()
@@ -352,7 +426,7 @@ class Chunker:
             section_content = content[start:end].strip()
 
             # Clean trailing delimiters
-            section_content = re.sub(r"\n={60,}\s*$", "", section_content).strip()
+            section_content = _TRAILING_DELIM_RE.sub("", section_content).strip()
 
             if section_content:
                 raw_sections.append((section_name, section_content))
@@ -369,48 +443,31 @@ class Chunker:
             return sections
 
         merged = []
-        pending_small = []  # Accumulate small sections to merge forward
+        # Small sections waiting to be merged forward, already in their merged form
+        pending_names = []
+        pending_parts = []
 
+        last = len(sections) - 1
         for i, (name, content) in enumerate(sections):
             is_small = len(content) < SMALL_SECTION_THRESHOLD
-            is_last = i == len(sections) - 1
 
-            if is_small and not is_last:
+            if is_small and i != last:
                 # Queue for merge section
-                pending_small.append((name, content))
+                pending_names.append(name)
+                pending_parts.append(f"[{name}]\n{content}")
+            elif pending_names:
+                # Prepend small sections
+                pending_names.append(name)
+                pending_parts.append(f"[{name}]\n{content}")
+                merged.append((" + ".join(pending_names), "\n\n".join(pending_parts)))
+                pending_names = []
+                pending_parts = []
+            elif is_small and merged:
+                # Small last section joins the previous one
+                prev_name, prev_content = merged[-1]
+                merged[-1] = (f"{prev_name} + {name}", f"{prev_content}\n\n[{name}]\n{content}")
             else:
-                # This section is large enough or is the last one
-                if pending_small:
-                    # Prepend small sections
-                    combined_content_parts = []
-                    combined_names = []
-                    for small_name, small_content in pending_small:
-                        combined_names.append(small_name)
-                        combined_content_parts.append(f"[{small_name}]\n{small_content}")
-                    combined_content_parts.append(f"[{name}]\n{content}")
-
-                    # Merged name
-                    merged_name = name
-                    if combined_names:
-                        merged_name = f"{' + '.join(combined_names)} + {name}"
-
-                    merged.append((merged_name, "\n\n".join(combined_content_parts)))
-                    pending_small = []
-                elif is_small and is_last and merged:
-                    prev_name, prev_content = merged[-1]
-                    combined_content = f"{prev_content}\n\n[{name}]\n{content}"
-                    merged[-1] = (f"{prev_name} + {name}", combined_content)
-                else:
-                    merged.append((name, content))
-
-        # Edge case: all small
-        if pending_small and not merged:
-            # Combine all
-            combined_names = [name for name, _ in pending_small]
-            combined_content = "\n\n".join(
-                f"[{name}]\n{content}" for name, content in pending_small
-            )
-            merged.append((" + ".join(combined_names), combined_content))
+                merged.append((name, content))
 
         return merged
 
@@ -425,7 +482,7 @@ class Chunker:
             return text
 
         # Find sentence boundaries
-        sentences = re.split(r"(?<=[.!?])\s+", text)
+        sentences = _split_sentences(text)
         if not sentences:
             return text[-target_size:]
 
@@ -454,7 +511,7 @@ class Chunker:
 
         chunks = []
         # Split on paragraphs
-        paragraphs = re.split(r"\n\s*\n", content)
+        paragraphs = _PARA_SPLIT_RE.split(content)
 
         current_chunk = ""
         for para in paragraphs:
@@ -474,7 +531,7 @@ class Chunker:
                         current_chunk = para
                 else:
                     # Split by sentences
-                    sentences = re.split(r"(?<=[.!?])\s+", para)
+                    sentences = _split_sentences(para)
                     for sent in sentences:
                         if len(current_chunk) + len(sent) + 1 > self.max_chunk_size:
                             if current_chunk:
@@ -1,3 +1,4 @@
+import functools
 import os
 import sqlite3
 from typing import Optional
@@ -6,6 +7,17 @@ from dataclasses import dataclass
 from core.models import Chunk
 
 
+# FTS5 syntax characters, blanked out of user queries in one pass
+_FTS_ESCAPE_TABLE = str.maketrans({char: " " for char in "\"'()*:^-"})
+
+_FTS_COLUMNS = "chunk_id, content, patient_id, doc_type, date, source_file, section"
+
+
+def _fts_values(row: str) -> str:
+    # e.g. "new.chunk_id, new.content, ..." for a trigger body
+    return ", ".join(f"{row}.{col}" for col in _FTS_COLUMNS.split(", "))
+
+
 @dataclass
 class FTSResult:
     chunk: Chunk
@@ -17,25 +29,18 @@ class FTSStore:
     def __init__(self, db_path: str = ":memory:"):
         self.db_path = db_path
         self.conn = None
+        self._wal = False
         self._init_db()
 
     def _init_db(self):
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
-
-        # FTS5 table
-        self.conn.execute("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
-                chunk_id,
-                content,
-                patient_id,
-                doc_type,
-                date,
-                source_file,
-                section,
-                tokenize='porter unicode61'
-            )
-        """)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        # Searches read index pages straight from a 256MB mapping and keep up
+        # to 64MB of them cached across queries
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.conn.execute("PRAGMA cache_size=-65536")
 
         # Metadata table
         self.conn.execute("""
@@ -55,36 +60,85 @@ class FTSStore:
             CREATE INDEX IF NOT EXISTS idx_patient ON chunks(patient_id)
         """)
 
+        # Indexes built before the FTS table became external-content hold a
+        # second copy of every chunk; drop it and re-index from chunks
+        rebuild = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts_content'"
+        ).fetchone() is not None
+        if rebuild:
+            self.conn.execute("DROP TABLE chunks_fts")
+
+        # FTS5 table, reading its columns from chunks
+        self.conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                chunk_id,
+                content,
+                patient_id,
+                doc_type,
+                date,
+                source_file,
+                section,
+                content='chunks',
+                tokenize='porter unicode61'
+            )
+        """)
+        if rebuild:
+            self.conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+
+        # Keep the FTS index in step with chunks
+        self.conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, {_FTS_COLUMNS})
+                VALUES (new.rowid, {_fts_values("new")});
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, {_FTS_COLUMNS})
+                VALUES ('delete', old.rowid, {_fts_values("old")});
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, {_FTS_COLUMNS})
+                VALUES ('delete', old.rowid, {_fts_values("old")});
+                INSERT INTO chunks_fts (rowid, {_FTS_COLUMNS})
+                VALUES (new.rowid, {_fts_values("new")});
+            END;
+        """)
+
         self.conn.commit()
 
     def add_chunks(self, chunks: list[Chunk]):
         if not chunks:
             return
 
-        cursor = self.conn.cursor()
-
-        for chunk in chunks:
-            patient_id = chunk.metadata.get("patient_id", "")
-            doc_type = chunk.metadata.get("doc_type", "")
-            date = chunk.metadata.get("date", "")
-            source_file = chunk.metadata.get("source_file", "")
-            section = chunk.metadata.get("section", "")
+        rows = [
+            (
+                chunk.id,
+                chunk.content,
+                chunk.metadata.get("patient_id", ""),
+                chunk.metadata.get("doc_type", ""),
+                chunk.metadata.get("date", ""),
+                chunk.metadata.get("source_file", ""),
+                chunk.metadata.get("section", ""),
+            )
+            for chunk in chunks
+        ]
 
-            # Regular table
-            cursor.execute("""
-                INSERT OR REPLACE INTO chunks
-                (chunk_id, content, patient_id, doc_type, date, source_file, section)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (chunk.id, chunk.content, patient_id, doc_type, date, source_file, section))
+        self._enable_wal()
 
-            # FTS table
-            cursor.execute("""
-                INSERT OR REPLACE INTO chunks_fts
+        # One transaction; triggers index the rows into chunks_fts. An upsert
+        # (not OR REPLACE) so re-added chunks fire the update trigger
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO chunks
                 (chunk_id, content, patient_id, doc_type, date, source_file, section)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (chunk.id, chunk.content, patient_id, doc_type, date, source_file, section))
-
-        self.conn.commit()
+                ON CONFLICT(chunk_id) DO UPDATE SET
+                    content = excluded.content,
+                    patient_id = excluded.patient_id,
+                    doc_type = excluded.doc_type,
+                    date = excluded.date,
+                    source_file = excluded.source_file,
+                    section = excluded.section
+            """, rows)
 
     def search(
         self,
@@ -100,6 +154,12 @@ class FTSStore:
 
         # SQL
         if patient_id:
+            # Filtering inside MATCH lets FTS5 intersect with the patient's
+            # doclist instead of ranking every hit first. The patient_id column
+            # gets zero BM25 weight so scores match an unfiltered search; the
+            # equality check keeps the filter exact.
+            quoted_id = patient_id.replace('"', '""')
+            fts_query = f'patient_id : "{quoted_id}" AND ({fts_query})'
             sql = """
                 SELECT
                     chunk_id,
@@ -109,7 +169,7 @@ class FTSStore:
                     date,
                     source_file,
                     section,
-                    bm25(chunks_fts) as score,
+                    bm25(chunks_fts, 1.0, 1.0, 0.0, 1.0, 1.0, 1.0, 1.0) as score,
                     snippet(chunks_fts, 1, '<b>', '</b>', '...', 32) as snippet
                 FROM chunks_fts
                 WHERE chunks_fts MATCH ? AND patient_id = ?
@@ -199,15 +259,15 @@ class FTSStore:
 
         return chunks
 
-    def _escape_query(self, query: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _escape_query(query: str) -> str:
         # Remove special chars
-        special_chars = ['"', "'", "(", ")", "*", ":", "^", "-"]
-        escaped = query
-        for char in special_chars:
-            escaped = escaped.replace(char, " ")
+        escaped = query.translate(_FTS_ESCAPE_TABLE)
 
-        # Split into terms
-        terms = [t.strip() for t in escaped.split() if t.strip()]
+        # Split into terms, each quoted as an FTS5 string so codes like
+        # "E11.9" match as adjacent tokens instead of breaking the syntax
+        terms = [f'"{term}"' for term in escaped.split()]
         if not terms:
             return ""
 
@@ -228,9 +288,24 @@ class FTSStore:
         """)
         return [row[0] for row in cursor.fetchall()]
 
+    def _enable_wal(self):
+        # WAL lets searches read while an index build writes (no-op in memory).
+        # Switched on only for writes: the mode is stored in the file, and
+        # read-only users shouldn't rewrite it or leave -wal/-shm files behind
+        if not self._wal:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self._wal = True
+
+    def checkpoint(self):
+        # Fold the WAL back into the database file and return to rollback
+        # journaling, leaving one self-contained file
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self._wal = False
+
     def clear(self):
+        self._enable_wal()
+        # The delete trigger clears the FTS index too
         self.conn.execute("DELETE FROM chunks")
-        self.conn.execute("DELETE FROM chunks_fts")
         self.conn.commit()
 
     def close(self):
@@ -1,20 +1,74 @@
 import os
 import re
-from glob import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from core.models import Document
 
+_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+_PATIENT_DIR_RE = re.compile(r"^[A-Z]+-\d{4}-\d{3}$")
+
+# Filename keyword -> doc type, in precedence order
+_DOC_TYPE_KEYWORDS = {
+    keyword: (rank, doc_type)
+    for rank, (keyword, doc_type) in enumerate([
+        ("progress_note", "progress_note"),
+        ("lab", "lab"),
+        ("hra", "hra"),
+        ("cardiology", "cardiology_consult"),
+        ("sleep_study", "sleep_study"),
+        ("polysomnography", "sleep_study"),
+        ("ct_", "imaging"),
+        ("mri_", "imaging"),
+        ("xray", "imaging"),
+        ("prior_year", "prior_year_problems"),
+        ("problem_list", "prior_year_problems"),
+        ("consult", "other_consult"),
+    ])
+}
+_DOC_TYPE_RE = re.compile("|".join(re.escape(keyword) for keyword in _DOC_TYPE_KEYWORDS))
+
+# Below this many files a thread pool costs more than the reads it overlaps
+_PARALLEL_READ_MIN_FILES = 8
+_MAX_READ_WORKERS = 16
+
 
 class DocumentLoader:
     def __init__(self, base_path: str):
         self.base_path = base_path
+        # Parsed results are reused until the files on disk change
+        self._documents = {}  # patient_id -> (file signature, documents)
+        self._patients = None  # (base dir mtime, patient ids)
+        self._lock = threading.Lock()
 
     def load_patient_documents(self, patient_id: str) -> list[Document]:
         patient_dir = os.path.join(self.base_path, patient_id)
-        documents = []
+        try:
+            # Same files glob("*.txt") would match, with one listing and no pattern matching
+            with os.scandir(patient_dir) as entries:
+                signature = tuple(
+                    (entry.path, entry.stat().st_mtime_ns)
+                    for entry in entries
+                    if entry.name.endswith(".txt") and not entry.name.startswith(".")
+                )
+        except (FileNotFoundError, NotADirectoryError):
+            signature = ()
+        file_paths = [path for path, _ in signature]
+
+        with self._lock:
+            entry = self._documents.get(patient_id)
+        if entry is not None and entry[0] == signature:
+            return list(entry[1])
+
+        if len(file_paths) >= _PARALLEL_READ_MIN_FILES:
+            # File reads release the GIL, so they overlap across threads
+            with ThreadPoolExecutor(max_workers=min(_MAX_READ_WORKERS, len(file_paths))) as pool:
+                contents = list(pool.map(self._read_file, file_paths))
+        else:
+            contents = [self._read_file(path) for path in file_paths]
 
-        for file_path in glob(os.path.join(patient_dir, "*.txt")):
-            content = self._read_file(file_path)
+        documents = []
+        for file_path, content in zip(file_paths, contents):
             doc = Document(
                 content=content,
                 patient_id=patient_id,
@@ -24,7 +78,11 @@ class DocumentLoader:
             )
             documents.append(doc)
 
-        return documents
+        if documents:
+            # Unknown IDs aren't remembered, so lookups can't grow the cache
+            with self._lock:
+                self._documents[patient_id] = (signature, documents)
+        return list(documents)
 
     def _read_file(self, file_path: str) -> str:
         with open(file_path, "r", encoding="utf-8") as f:
@@ -32,37 +90,33 @@ class DocumentLoader:
 
     def _infer_doc_type(self, file_path: str) -> str:
         filename = os.path.basename(file_path).lower()
-
-        if "progress_note" in filename:
-            return "progress_note"
-        elif "lab_results" in filename or "lab" in filename:
-            return "lab"
-        elif "hra" in filename:
-            return "hra"
-        elif "cardiology" in filename:
-            return "cardiology_consult"
-        elif "sleep_study" in filename or "polysomnography" in filename:
-            return "sleep_study"
-        elif "ct_" in filename or "mri_" in filename or "xray" in filename:
-            return "imaging"
-        elif "prior_year" in filename or "problem_list" in filename:
-            return "prior_year_problems"
-        elif "consult" in filename:
-            return "other_consult"
-        else:
-            return "other"
+        # Several keywords can appear in one name; the earliest listed wins
+        return min(
+            (_DOC_TYPE_KEYWORDS[m.group()] for m in _DOC_TYPE_RE.finditer(filename)),
+            default=(len(_DOC_TYPE_KEYWORDS), "other"),
+        )[1]
 
     def _extract_date(self, file_path: str) -> Optional[str]:
         filename = os.path.basename(file_path)
-        match = re.search(r"(\d{4}-\d{2}-\d{2})", filename)
+        match = _DATE_RE.search(filename)
         if match:
             return match.group(1)
         return None
 
     def list_patients(self) -> list[str]:
+        # Adding or removing a patient directory bumps the base dir's mtime
+        mtime = os.stat(self.base_path).st_mtime_ns
+        with self._lock:
+            if self._patients is not None and self._patients[0] == mtime:
+                return list(self._patients[1])
+
         patients = []
         for item in os.listdir(self.base_path):
             item_path = os.path.join(self.base_path, item)
-            if os.path.isdir(item_path) and re.match(r"^[A-Z]+-\d{4}-\d{3}$", item):
+            if os.path.isdir(item_path) and _PATIENT_DIR_RE.match(item):
                 patients.append(item)
-        return sorted(patients)
+        patients.sort()
+
+        with self._lock:
+            self._patients = (mtime, patients)
+        return list(patients)
@@ -1,3 +1,4 @@
+import heapq
 import logging
 import os
 from typing import Optional
@@ -47,6 +48,32 @@ class HybridSearch:
         else:
             return self._hybrid_search(query, top_k, patient_id)
 
+    def search_batch(
+        self,
+        queries: list[str],
+        top_k: int = 5,
+        patient_id: Optional[str] = None,
+        mode: str = "hybrid"
+    ) -> list[list[HybridResult]]:
+        # Vector side is batched (one encode + one FAISS call); FTS runs per query
+        if mode == "fts":
+            return [self._fts_search(query, top_k, patient_id) for query in queries]
+
+        if mode == "vector":
+            batch = self.vector_store.search_batch(queries, top_k=top_k, patient_id=patient_id)
+            return [self._from_vector_results(results) for results in batch]
+
+        fetch_k = top_k * 2
+        batch = self.vector_store.search_batch(queries, top_k=fetch_k, patient_id=patient_id)
+        return [
+            self._fuse(
+                vector_results,
+                self.fts_store.search(query, top_k=fetch_k, patient_id=patient_id),
+                top_k,
+            )
+            for query, vector_results in zip(queries, batch)
+        ]
+
     def _vector_search(
         self,
         query: str,
@@ -54,6 +81,10 @@ class HybridSearch:
         patient_id: Optional[str]
     ) -> list[HybridResult]:
         results = self.vector_store.search(query, top_k=top_k, patient_id=patient_id)
+        return self._from_vector_results(results)
+
+    @staticmethod
+    def _from_vector_results(results) -> list[HybridResult]:
         return [
             HybridResult(
                 chunk=r.chunk,
@@ -94,6 +125,9 @@ class HybridSearch:
         vector_results = self.vector_store.search(query, top_k=fetch_k, patient_id=patient_id)
         fts_results = self.fts_store.search(query, top_k=fetch_k, patient_id=patient_id)
 
+        return self._fuse(vector_results, fts_results, top_k)
+
+    def _fuse(self, vector_results, fts_results, top_k: int) -> list[HybridResult]:
         # Score maps
         vector_scores: dict[str, float] = {}
         fts_scores: dict[str, float] = {}
@@ -107,36 +141,33 @@ class HybridSearch:
 
         # FTS scores (normalized)
         if fts_results:
-            max_fts = max(r.score for r in fts_results) if fts_results else 1.0
+            # FTSStore.search returns best-first, so the first score is the max
+            max_fts = fts_results[0].score
             for r in fts_results:
                 normalized = r.score / max_fts if max_fts > 0 else 0
                 fts_scores[r.chunk.id] = normalized
                 chunks[r.chunk.id] = r.chunk
                 snippets[r.chunk.id] = r.snippet
 
-        # Combine scores
-        all_chunk_ids = set(vector_scores.keys()) | set(fts_scores.keys())
-        combined: list[HybridResult] = []
+        # Combine scores; only the top_k become results. Ids are visited in
+        # arrival order (vector hits, then FTS-only hits) so ties are stable
+        scores = {
+            chunk_id: (self.vector_weight * vector_scores.get(chunk_id, 0.0))
+            + (self.fts_weight * fts_scores.get(chunk_id, 0.0))
+            for chunk_id in chunks
+        }
+        top_ids = heapq.nlargest(top_k, scores, key=scores.__getitem__)
 
-        for chunk_id in all_chunk_ids:
-            vs = vector_scores.get(chunk_id, 0.0)
-            fs = fts_scores.get(chunk_id, 0.0)
-
-            # Weighted
-            combined_score = (self.vector_weight * vs) + (self.fts_weight * fs)
-
-            combined.append(HybridResult(
+        return [
+            HybridResult(
                 chunk=chunks[chunk_id],
-                score=combined_score,
-                vector_score=vs if chunk_id in vector_scores else None,
-                fts_score=fs if chunk_id in fts_scores else None,
+                score=scores[chunk_id],
+                vector_score=vector_scores.get(chunk_id),
+                fts_score=fts_scores.get(chunk_id),
                 snippet=snippets.get(chunk_id)
-            ))
-
-        # Sort
-        combined.sort(key=lambda x: x.score, reverse=True)
-
-        return combined[:top_k]
+            )
+            for chunk_id in top_ids
+        ]
 
 
 class SearchIndex:
@@ -180,7 +211,19 @@ class SearchIndex:
     ) -> list[HybridResult]:
         return self.hybrid.search(query, top_k, patient_id, mode)
 
+    def search_batch(
+        self,
+        queries: list[str],
+        top_k: int = 5,
+        patient_id: Optional[str] = None,
+        mode: str = "hybrid"
+    ) -> list[list[HybridResult]]:
+        return self.hybrid.search_batch(queries, top_k, patient_id, mode)
+
     def patient_exists(self, patient_id: str) -> bool:
+        # The in-memory vector map answers most lookups without a SQLite query
+        if patient_id in self.vector_store.patient_to_indices:
+            return True
         return self.fts_store.patient_exists(patient_id)
 
     def get_patient_documents(self, patient_id: str) -> list[Chunk]:
@@ -190,7 +233,8 @@ class SearchIndex:
         os.makedirs(self.index_dir, exist_ok=True)
         vector_path = os.path.join(self.index_dir, "vector")
         self.vector_store.save(vector_path)
-        # FTS persisted via SQLite
+        # FTS persisted via SQLite; checkpointed so the saved index is one file
+        self.fts_store.checkpoint()
 
     def list_patients(self) -> list[str]:
         return self.fts_store.list_patients()
@@ -1,12 +1,43 @@
 import os
 import json
 import pickle
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
 from typing import Optional
 from dataclasses import dataclass
 
 import numpy as np
+import orjson
 
 from core.models import Chunk
+from config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    VECTOR_HNSW_THRESHOLD,
+    VECTOR_HNSW_M,
+    VECTOR_HNSW_EF_SEARCH,
+    VECTOR_HNSW_SQ8,
+    VECTOR_DISK_FP16,
+    FAISS_OMP_THREADS,
+)
+
+# Query embeddings, shared by all stores: (model name, query) -> read-only vector, LRU
+_QUERY_CACHE_SIZE = 4096
+_query_embeddings = OrderedDict()
+_query_embeddings_lock = threading.Lock()
+
+_faiss_configured = False
+
+
+def _configure_faiss():
+    # Process-wide OpenMP setting, applied once before the first index exists
+    global _faiss_configured
+    if not _faiss_configured:
+        import faiss
+        faiss.omp_set_num_threads(FAISS_OMP_THREADS)
+        _faiss_configured = True
 
 
 @dataclass
@@ -15,18 +46,52 @@ class SearchResult:
     score: float
 
 
+class _EmbeddingDiskCache:
+    # Query embeddings keyed by "model:sha1(text)", kept between processes
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(
+            os.path.join(cache_dir, "query_embeddings.db"), check_same_thread=False
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: str, text: str) -> str:
+        return f"{model}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, model: str, texts: list[str]) -> dict[str, np.ndarray]:
+        keys = {self._key(model, text): text for text in texts}
+        placeholders = ", ".join("?" * len(keys))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", list(keys)
+            ).fetchall()
+        return {keys[key]: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+
+    def put_many(self, model: str, vectors: dict[str, np.ndarray]):
+        rows = [(self._key(model, text), vector.tobytes()) for text, vector in vectors.items()]
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+
+
 class VectorStore:
     def __init__(
         self,
         embedding_model: str = "NeuML/pubmedbert-base-embeddings",
-        index_path: Optional[str] = None
+        index_path: Optional[str] = None,
+        cache_dir: Optional[str] = EMBEDDING_CACHE_DIR
     ):
         self.embedding_model_name = embedding_model
         self.index_path = index_path
+        # Disk-backed query embeddings; a warm cache never loads the encoder
+        self._disk_cache = _EmbeddingDiskCache(cache_dir) if cache_dir else None
         self.embedder = None
         self.index = None
         self.chunks: list[Chunk] = []  # Ordered list matching FAISS index
         self.chunk_to_idx: dict[str, int] = {}  # chunk.id -> index position
+        self.patient_to_indices: dict[str, list[int]] = {}  # patient_id -> index positions
         self._dimension = None
 
     def _load_embedder(self):
@@ -37,13 +102,67 @@ class VectorStore:
 
     def _init_index(self):
         import faiss
+        _configure_faiss()
         self._load_embedder()
         self.index = faiss.IndexFlatIP(self._dimension)  # Inner product (cosine after norm)
 
+    def _upgrade_index(self, incoming: int):
+        # Past the threshold, move the vectors into HNSW; ids stay in insertion order
+        if hasattr(self.index, "hnsw") or self.index.ntotal + incoming < VECTOR_HNSW_THRESHOLD:
+            return
+        import faiss
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        if VECTOR_HNSW_SQ8 and len(vectors):
+            # The flat index holds real embeddings to learn the 8-bit ranges from
+            index = faiss.IndexHNSWSQ(
+                self._dimension, faiss.ScalarQuantizer.QT_8bit, VECTOR_HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+        else:
+            index = faiss.IndexHNSWFlat(self._dimension, VECTOR_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = VECTOR_HNSW_EF_SEARCH
+        if len(vectors):
+            index.add(vectors)
+        self.index = index
+
     def embed(self, texts: list[str]) -> np.ndarray:
         self._load_embedder()
-        embeddings = self.embedder.encode(texts, normalize_embeddings=True)
-        return embeddings.astype(np.float32)
+        embeddings = self.embedder.encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        # encode() already length-sorts texts into batches and restores their order
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def embed_queries(self, queries: list[str]) -> np.ndarray:
+        # Agents repeat queries across turns; only unseen ones reach the encoder
+        keys = [(self.embedding_model_name, query) for query in queries]
+        with _query_embeddings_lock:
+            cached = [_query_embeddings.get(key) for key in keys]
+            for key, vector in zip(keys, cached):
+                if vector is not None:
+                    _query_embeddings.move_to_end(key)
+
+        missing = list(dict.fromkeys(q for q, vector in zip(queries, cached) if vector is None))
+        if missing:
+            fresh = self._disk_cache.get_many(self.embedding_model_name, missing) if self._disk_cache else {}
+            unseen = [q for q in missing if q not in fresh]
+            if unseen:
+                encoded = dict(zip(unseen, self.embed(unseen)))
+                if self._disk_cache:
+                    self._disk_cache.put_many(self.embedding_model_name, encoded)
+                fresh.update(encoded)
+            with _query_embeddings_lock:
+                for query, vector in fresh.items():
+                    vector.flags.writeable = False
+                    _query_embeddings[(self.embedding_model_name, query)] = vector
+                while len(_query_embeddings) > _QUERY_CACHE_SIZE:
+                    _query_embeddings.popitem(last=False)
+            cached = [fresh[q] if vector is None else vector for q, vector in zip(queries, cached)]
+
+        return np.stack(cached)
 
     def add_chunks(self, chunks: list[Chunk]):
         if not chunks:
@@ -58,12 +177,40 @@ class VectorStore:
 
         # Add to FAISS
         start_idx = len(self.chunks)
+        self._upgrade_index(len(chunks))
         self.index.add(embeddings)
 
         # Store chunk references
         for i, chunk in enumerate(chunks):
             self.chunks.append(chunk)
             self.chunk_to_idx[chunk.id] = start_idx + i
+            self._track_patient(chunk, start_idx + i)
+
+    def _track_patient(self, chunk: Chunk, idx: int):
+        patient_id = chunk.metadata.get("patient_id")
+        if patient_id:
+            self.patient_to_indices.setdefault(patient_id, []).append(idx)
+
+    def _search_index(self, embeddings: np.ndarray, top_k: int, patient_id: Optional[str]):
+        if not patient_id:
+            return self.index.search(embeddings, min(top_k, self.index.ntotal))
+
+        # Only the patient's vectors are scored, so a rare patient can't be
+        # crowded out of the candidates by everyone else's chunks
+        ids = self.patient_to_indices.get(patient_id)
+        if not ids:
+            empty = len(embeddings), 0
+            return np.empty(empty, dtype=np.float32), np.empty(empty, dtype=np.int64)
+
+        import faiss
+        selector = faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64))
+        if hasattr(self.index, "hnsw"):
+            # The graph walk still visits other patients' nodes; widen the beam
+            ef_search = max(self.index.hnsw.efSearch, top_k * 10)
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        return self.index.search(embeddings, min(top_k, len(ids)), params=params)
 
     def search(
         self,
@@ -74,18 +221,51 @@ class VectorStore:
     ) -> list[SearchResult]:
         if self.index is None or self.index.ntotal == 0:
             return []
+        # Nothing to find for a patient with no chunks; skip the encoder
+        if patient_id and patient_id not in self.patient_to_indices:
+            return []
 
         # Embed query
-        query_embedding = self.embed([query])
-
-        # Search more than needed if filtering by patient
-        search_k = top_k * 10 if patient_id else top_k
+        query_embedding = self.embed_queries([query])
 
         # FAISS search
-        scores, indices = self.index.search(query_embedding, min(search_k, self.index.ntotal))
+        scores, indices = self._search_index(query_embedding, top_k, patient_id)
+
+        return self._collect_results(scores[0], indices[0], top_k, patient_id, min_score)
 
+    def search_batch(
+        self,
+        queries: list[str],
+        top_k: int = 5,
+        patient_id: Optional[str] = None,
+        min_score: float = 0.0
+    ) -> list[list[SearchResult]]:
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in queries]
+        if patient_id and patient_id not in self.patient_to_indices:
+            return [[] for _ in queries]
+        if not queries:
+            return []
+
+        # One encoder pass and one FAISS call for all queries
+        query_embeddings = self.embed_queries(queries)
+        scores, indices = self._search_index(query_embeddings, top_k, patient_id)
+
+        return [
+            self._collect_results(row_scores, row_indices, top_k, patient_id, min_score)
+            for row_scores, row_indices in zip(scores, indices)
+        ]
+
+    def _collect_results(
+        self,
+        scores,
+        indices,
+        top_k: int,
+        patient_id: Optional[str],
+        min_score: float
+    ) -> list[SearchResult]:
         results = []
-        for score, idx in zip(scores[0], indices[0]):
+        for score, idx in zip(scores, indices):
             if idx < 0 or score < min_score:
                 continue
 
@@ -107,9 +287,20 @@ class VectorStore:
 
         os.makedirs(path, exist_ok=True)
 
-        # Save FAISS index
+        # Save FAISS index; a flat index is just its vectors, stored at half precision
         if self.index is not None:
-            faiss.write_index(self.index, os.path.join(path, "index.faiss"))
+            index_path = os.path.join(path, "index.faiss")
+            vectors_path = os.path.join(path, "vectors.f16.npy")
+            if VECTOR_DISK_FP16 and not hasattr(self.index, "hnsw"):
+                vectors = self.index.reconstruct_n(0, self.index.ntotal)
+                np.save(vectors_path, vectors.astype(np.float16))
+                stale_path = index_path
+            else:
+                faiss.write_index(self.index, index_path)
+                stale_path = vectors_path
+            # Only one format per directory, so load can't pick up an older one
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
 
         # Save chunks as JSON (for readability)
         chunks_data = []
@@ -120,8 +311,9 @@ class VectorStore:
                 "metadata": chunk.metadata
             })
 
-        with open(os.path.join(path, "chunks.json"), "w") as f:
-            json.dump(chunks_data, f, indent=2)
+        # orjson writes the same indented JSON several times faster than json.dump
+        with open(os.path.join(path, "chunks.json"), "wb") as f:
+            f.write(orjson.dumps(chunks_data, option=orjson.OPT_INDENT_2))
 
         # Save config
         config = {
@@ -134,6 +326,7 @@ class VectorStore:
 
     def load(self, path: str):
         import faiss
+        _configure_faiss()
 
         # Load config
         with open(os.path.join(path, "config.json")) as f:
@@ -144,15 +337,23 @@ class VectorStore:
 
         # Load FAISS index
         index_path = os.path.join(path, "index.faiss")
-        if os.path.exists(index_path):
-            self.index = faiss.read_index(index_path)
+        vectors_path = os.path.join(path, "vectors.f16.npy")
+        if os.path.exists(vectors_path):
+            self.index = faiss.IndexFlatIP(self._dimension)
+            self.index.add(np.load(vectors_path).astype(np.float32))
+        elif os.path.exists(index_path):
+            # Mapped rather than read up front; pages load as searches touch them
+            self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            if hasattr(self.index, "hnsw"):
+                self.index.hnsw.efSearch = VECTOR_HNSW_EF_SEARCH
 
         # Load chunks
-        with open(os.path.join(path, "chunks.json")) as f:
-            chunks_data = json.load(f)
+        with open(os.path.join(path, "chunks.json"), "rb") as f:
+            chunks_data = orjson.loads(f.read())
 
         self.chunks = []
         self.chunk_to_idx = {}
+        self.patient_to_indices = {}
         for i, data in enumerate(chunks_data):
             chunk = Chunk(
                 id=data["id"],
@@ -161,11 +362,13 @@ class VectorStore:
             )
             self.chunks.append(chunk)
             self.chunk_to_idx[chunk.id] = i
+            self._track_patient(chunk, i)
 
     def clear(self):
         self.index = None
         self.chunks = []
         self.chunk_to_idx = {}
+        self.patient_to_indices = {}
 
     def __len__(self):
         return len(self.chunks)
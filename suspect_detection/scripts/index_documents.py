@@ -3,6 +3,7 @@ import os
 import shutil
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
@@ -11,26 +12,35 @@ from config import PATIENT_DATA_PATH, INDEX_DIR, EMBEDDING_MODEL
 from retrieval.loader import DocumentLoader
 from retrieval.chunker import Chunker
 from retrieval.search import SearchIndex
+from core.models import Chunk
 
+# Chunks are embedded in batches of at least this many, across patient boundaries
+FLUSH_CHUNKS = 2048
 
-def index_patient(patient_id: str, loader: DocumentLoader, chunker: Chunker, index: SearchIndex) -> int:
-    print(f"  Loading documents for {patient_id}...")
-    documents = loader.load_patient_documents(patient_id)
+# Per-process loader and chunker for pool workers (the tokenizer loads once per worker)
+_worker_loader = None
+_worker_chunker = None
 
-    if not documents:
-        print(f"  No documents found for {patient_id}")
-        return 0
 
-    print(f"  Found {len(documents)} documents")
+def chunk_patient(patient_id: str, loader: DocumentLoader, chunker: Chunker) -> tuple[int, list[Chunk]]:
+    documents = loader.load_patient_documents(patient_id)
 
     all_chunks = []
     for doc in documents:
         chunks = chunker.chunk_document(doc)
         all_chunks.extend(chunks)
 
-    print(f"  Created {len(all_chunks)} chunks")
-    index.add_chunks(all_chunks)
-    return len(all_chunks)
+    return len(documents), all_chunks
+
+
+def _init_worker(data_dir: str):
+    global _worker_loader, _worker_chunker
+    _worker_loader = DocumentLoader(data_dir)
+    _worker_chunker = Chunker()
+
+
+def _chunk_patient_in_worker(patient_id: str) -> tuple[int, list[Chunk]]:
+    return chunk_patient(patient_id, _worker_loader, _worker_chunker)
 
 
 def main():
@@ -49,7 +59,6 @@ def main():
     print(f"Embedding model: {EMBEDDING_MODEL}\n")
 
     loader = DocumentLoader(PATIENT_DATA_PATH)
-    chunker = Chunker()
     index = SearchIndex(index_dir=INDEX_DIR, embedding_model=EMBEDDING_MODEL)
 
     start_time = time.time()
@@ -61,9 +70,40 @@ def main():
 
     print(f"Indexing {len(patients)} patient(s)...")
     total_chunks = 0
-    for patient_id in patients:
-        print(f"\nPatient: {patient_id}")
-        total_chunks += index_patient(patient_id, loader, chunker, index)
+    pending = []
+    workers = min(os.cpu_count() or 1, len(patients))
+
+    # Loading and chunking is CPU-bound Python, so it fans out across processes;
+    # results arrive in patient order and embedding stays in this process
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(PATIENT_DATA_PATH,))
+        results = pool.map(_chunk_patient_in_worker, patients)
+    else:
+        pool = None
+        chunker = Chunker()
+        results = (chunk_patient(patient_id, loader, chunker) for patient_id in patients)
+
+    try:
+        for patient_id, (num_documents, chunks) in zip(patients, results):
+            print(f"\nPatient: {patient_id}")
+            if not num_documents:
+                print(f"  No documents found for {patient_id}")
+                continue
+            print(f"  Found {num_documents} documents")
+            print(f"  Created {len(chunks)} chunks")
+
+            pending.extend(chunks)
+            if len(pending) >= FLUSH_CHUNKS:
+                index.add_chunks(pending)
+                total_chunks += len(pending)
+                pending = []
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if pending:
+        index.add_chunks(pending)
+        total_chunks += len(pending)
 
     print("\nSaving index...")
     index.save()
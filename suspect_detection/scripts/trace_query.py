@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import asyncio
+import hashlib
 import sys
 import os
 import logging
@@ -18,15 +20,17 @@ from agents.graph import create_graph
 from agents.state import create_initial_state
 
 
-def trace_query(query: str, verbose: bool = False):
+async def trace_query(query: str, verbose: bool = False):
     # Trace a query through the LangGraph workflow
     graph = create_graph()
     initial_state = create_initial_state(query)
-    config = {"configurable": {"thread_id": f"trace-{hash(query)}"}}
+    # Stable across runs, unlike hash() under PYTHONHASHSEED randomization
+    thread_id = f"trace-{hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]}"
+    config = {"configurable": {"thread_id": thread_id}}
 
     node_count = 0
 
-    for event in graph.stream(initial_state, config=config, stream_mode="updates"):
+    async for event in graph.astream(initial_state, config=config, stream_mode="updates"):
         if event is None:
             continue
 
@@ -85,14 +89,17 @@ def trace_query(query: str, verbose: bool = False):
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Trace LangGraph query execution")
+    parser = argparse.ArgumentParser(
+        description="Trace LangGraph query execution",
+        epilog="Set SUSPECT_EMB_CACHE_DIR to reuse query embeddings across runs",
+    )
     parser.add_argument("query", nargs="?", default="List patients",
                        help="Query to trace")
     parser.add_argument("-v", "--verbose", action="store_true",
                        help="Show detailed output for each node")
 
     args = parser.parse_args()
-    trace_query(args.query, verbose=args.verbose)
+    asyncio.run(trace_query(args.query, verbose=args.verbose))
 
 
 if __name__ == "__main__":
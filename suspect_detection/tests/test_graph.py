@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from agents.graph import run_analysis_sync
+
+
+class _LoopBoundGraph:
+    """Stands in for a compiled graph whose client pools connections per loop."""
+
+    def __init__(self):
+        self.loops = []
+        self._queue = None
+
+    async def ainvoke(self, state, config=None):
+        loop = asyncio.get_running_loop()
+        self.loops.append(loop)
+        # An asyncio.Queue fails when reused from a different event loop,
+        # the same way pooled httpx connections do
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        await self._queue.put(state["user_message"])
+        return {"response": await self._queue.get()}
+
+
+class RunAnalysisSyncTest(unittest.TestCase):
+    def test_repeated_calls_share_one_live_loop(self):
+        graph = _LoopBoundGraph()
+
+        first = run_analysis_sync("first", graph=graph)
+        second = run_analysis_sync("second", graph=graph)
+
+        self.assertEqual(first["response"], "first")
+        self.assertEqual(second["response"], "second")
+        self.assertIs(graph.loops[0], graph.loops[1])
+        self.assertFalse(graph.loops[0].is_closed())
+
+
+if __name__ == "__main__":
+    unittest.main()